@@ -0,0 +1,170 @@
+"""Compares the memory used by the guild caches, and the time taken to fill them, for each gateway profile.
+
+Synthetic guilds are fed through discord.py's own connection state, shaped like the payloads that discord would
+send for each profile's intents. Run from the repository root with 'python -m benchmarks.gateway'.
+"""
+import gc
+import random
+import time
+import tracemalloc
+from collections.abc import Iterator
+from typing import Any
+
+import discord
+from discord.state import ConnectionState
+
+from cd import values
+
+
+GUILDS: int = 100
+MEMBERS: int = 2_000
+VOICE_RATIO: float = 0.01
+ONLINE_RATIO: float = 0.3
+LARGE_THRESHOLD: int = 250
+# discord sends at most this many members per GUILD_MEMBERS_CHUNK event
+CHUNK_SIZE: int = 1_000
+SEED: int = 0
+
+type Payload = dict[str, Any]
+
+
+def _member(user_id: int) -> Payload:
+    return {
+        "user":      {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None},
+        "roles":     [],
+        "joined_at": "2023-01-01T00:00:00+00:00",
+        "nick":      None,
+        "deaf":      False,
+        "mute":      False,
+        "flags":     0,
+    }
+
+
+def _presence(user_id: int) -> Payload:
+    return {
+        "user":          {"id": str(user_id)},
+        "status":        "online",
+        "activities":    [{"name": "Spotify", "type": 2}],
+        "client_status": {"desktop": "online"},
+    }
+
+
+def _voice_state(user_id: int, channel_id: int) -> Payload:
+    return {
+        "user_id":    str(user_id),
+        "channel_id": str(channel_id),
+        "session_id": "0",
+        "deaf":       False,
+        "mute":       False,
+        "self_deaf":  False,
+        "self_mute":  False,
+        "self_video": False,
+        "suppress":   False,
+    }
+
+
+def _guilds(intents: discord.Intents, chunk: bool) -> Iterator[tuple[Payload, list[Payload]]]:
+    # yields a GUILD_CREATE payload and the GUILD_MEMBERS_CHUNK payloads that would follow it
+    rng = random.Random(SEED)
+    for index in range(GUILDS):
+        guild_id = 1_000_000 + index
+        voice_id = guild_id * 10 + 1
+        user_ids = [guild_id * 100_000 + offset for offset in range(MEMBERS)]
+        voice_ids = set(rng.sample(user_ids, int(MEMBERS * VOICE_RATIO)))
+        online_ids = set(rng.sample(user_ids, int(MEMBERS * ONLINE_RATIO)))
+        large = MEMBERS > LARGE_THRESHOLD
+        # large guilds only come with the members that are in voice channels, the rest have to be chunked
+        initial = user_ids if intents.members and not large else [u for u in user_ids if u in voice_ids]
+        guild = {
+            "id":           str(guild_id),
+            "name":         f"guild{index}",
+            "owner_id":     str(user_ids[0]),
+            "member_count": MEMBERS,
+            "large":        large,
+            "roles":        [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0}],
+            "channels":     [
+                {"id": str(guild_id * 10), "type": 0, "name": "text", "position": 0},
+                {"id": str(voice_id), "type": 2, "name": "voice", "position": 1, "bitrate": 64000,
+                 "user_limit": 0},
+            ],
+            "voice_states": [_voice_state(u, voice_id) for u in user_ids if u in voice_ids]
+            if intents.voice_states else [],
+            "members":      [_member(u) for u in initial],
+            "presences":    [_presence(u) for u in initial if u in online_ids] if intents.presences else [],
+        }
+        chunks = [
+            {
+                "guild_id":  str(guild_id),
+                "members":   [_member(u) for u in user_ids[start:start + CHUNK_SIZE]],
+                "presences": [_presence(u) for u in user_ids[start:start + CHUNK_SIZE] if u in online_ids]
+                if intents.presences else [],
+            }
+            for start in range(0, MEMBERS, CHUNK_SIZE)
+        ] if chunk and intents.members else []
+        yield guild, chunks
+
+
+def _state(intents: discord.Intents) -> ConnectionState:
+    return ConnectionState(
+        dispatch=lambda *_: None,
+        handlers={},
+        hooks={},
+        http=None,  # pyright: ignore
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.from_intents(intents),
+    )
+
+
+def _feed(state: ConnectionState, guild_payload: Payload, chunks: list[Payload]) -> None:
+    guild = state._add_guild_from_data(guild_payload)  # pyright: ignore
+    # the same as GUILD_MEMBERS_CHUNK handling when the chunk was requested with cache=True
+    for chunk in chunks:
+        members = {m["user"]["id"]: discord.Member(data=m, guild=guild, state=state) for m in chunk["members"]}
+        for presence in chunk["presences"]:
+            members[presence["user"]["id"]]._presence_update(presence, presence["user"])  # pyright: ignore
+        for member in members.values():
+            guild._add_member(member)
+
+
+def _run(intents: discord.Intents, chunk: bool) -> tuple[float, float, int, int]:
+    # memory is measured while the payloads are generated and dropped one guild at a time, so that only what the
+    # cache keeps hold of is counted
+    gc.collect()
+    tracemalloc.start()
+    state = _state(intents)
+    chunks_sent = 0
+    for guild_payload, chunks in _guilds(intents, chunk):
+        _feed(state, guild_payload, chunks)
+        chunks_sent += len(chunks)
+        del guild_payload, chunks
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    members = sum(len(guild._members) for guild in state._guilds.values())  # pyright: ignore
+    # timing excludes generating the payloads
+    payloads = list(_guilds(intents, chunk))
+    state = _state(intents)
+    start = time.perf_counter()
+    for guild_payload, chunks in payloads:
+        _feed(state, guild_payload, chunks)
+    seconds = time.perf_counter() - start
+    return memory, seconds, members, chunks_sent
+
+
+def main() -> None:
+    runs = {
+        "minimal-music":  (values.INTENT_PROFILES["minimal-music"], False),
+        "full":           (values.INTENT_PROFILES["full"], False),
+        "full (chunked)": (values.INTENT_PROFILES["full"], True),
+    }
+    print(f"{GUILDS} guilds with {MEMBERS} members each, {VOICE_RATIO:.0%} in voice, {ONLINE_RATIO:.0%} online.\n")
+    for name, (intents, chunk) in runs.items():
+        memory, seconds, members, chunks = _run(intents, chunk)
+        print(
+            f"{name:>14}: {memory / 1024 / 1024:8.2f}mb, {seconds * 1000:8.2f}ms, "
+            f"{members:>7} members cached, {chunks:>4} chunk events"
+        )
+
+
+if __name__ == "__main__":
+    main()
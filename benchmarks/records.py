@@ -0,0 +1,41 @@
+"""Compares converting database records into data objects with dacite and with the precompiled converters.
+
+Run from the repository root with 'python -m benchmarks.records'.
+"""
+import timeit
+
+import dacite
+
+from cd import objects, utilities
+
+
+RECORDS: int = 100_000
+REPEATS: int = 5
+
+
+def _dacite(records: list[dict[str, int | str | None]]) -> None:
+    for record in records:
+        dacite.from_dict(objects.GuildData, {**record}, config=utilities.DACITE_CONFIG)
+
+
+def _converter(records: list[dict[str, int | str | None]]) -> None:
+    for record in records:
+        utilities.from_record(objects.GuildData, record)
+
+
+def main() -> None:
+    records: list[dict[str, int | str | None]] = [
+        {"id": _id, "prefix": "!" if _id % 2 else None}
+        for _id in range(RECORDS)
+    ]
+    results = {
+        "dacite":    min(timeit.repeat(lambda: _dacite(records), number=1, repeat=REPEATS)),
+        "converter": min(timeit.repeat(lambda: _converter(records), number=1, repeat=REPEATS)),
+    }
+    for name, seconds in results.items():
+        print(f"{name:>9}: {seconds * 1000:8.2f}ms total, {seconds / RECORDS * 1_000_000:6.3f}µs per record")
+    print(f"{"speedup":>9}: {results["dacite"] / results["converter"]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,49 @@
 from __future__ import annotations
 
+import asyncio
 import collections
 import logging
 
 import aiohttp
 import asyncpg
 import discord
-from discord.ext import commands, lava
+from discord.ext import commands
 from discord.utils import MISSING
 from redis import asyncio as aioredis
 
-from cd import custom, objects, values, webhooks
+from cd import custom, enums, objects, utilities, values, webhooks
 from cd.config import CONFIG
-from cd.modules.voice.custom import Player
+from cd.database import Database
+from cd.modules.stats.recorder import StatsRecorder
+from cd.modules.stats.timings import CommandTimings
+from cd.modules.voice.custom import IdleReaper, NodePool, PlayerExecutor, PlayerSnapshots, ProgressTicker
+from cd.modules.voice.custom import SearchCache
 
 
 __all__ = ["CD"]
 __log__ = logging.getLogger("cd.bot")
 
-type Database = asyncpg.Pool[asyncpg.Record]
 type Redis = aioredis.Redis
-type Lavalink = lava.Link[Player]
+
+
+def _gateway_options() -> tuple[discord.Intents, discord.MemberCacheFlags]:
+    gateway = CONFIG.discord.gateway
+    intents = discord.Intents(**{**dict(values.INTENT_PROFILES[gateway.profile]), **gateway.intents})
+    # only cache what the intents can keep up to date, unless the config says otherwise
+    member_cache_flags = discord.MemberCacheFlags(
+        **{**dict(discord.MemberCacheFlags.from_intents(intents)), **gateway.member_cache}
+    )
+    return intents, member_cache_flags
 
 
 class CD(commands.AutoShardedBot):
 
     def __init__(self) -> None:
+        intents, member_cache_flags = _gateway_options()
         super().__init__(
-            intents=values.INTENTS,
+            intents=intents,
+            member_cache_flags=member_cache_flags,
+            chunk_guilds_at_startup=CONFIG.discord.gateway.chunk_guilds_at_startup,
             allowed_mentions=values.ALLOWED_MENTIONS,
             status=values.STATUS,
             activity=values.ACTIVITY,
@@ -39,11 +55,43 @@ class CD(commands.AutoShardedBot):
         self.webhooks: webhooks.Webhooks = discord.utils.MISSING
         self.database: Database = discord.utils.MISSING
         self.redis: Redis = discord.utils.MISSING
-        self.lavalink: Lavalink = discord.utils.MISSING
+        self.lavalink: NodePool = discord.utils.MISSING
+        self.data_writer: objects.DataWriter = discord.utils.MISSING
+        self.shared_cache: objects.SharedCache = discord.utils.MISSING
+        self.player_snapshots: PlayerSnapshots = discord.utils.MISSING
+        self.stats_recorder: StatsRecorder = discord.utils.MISSING
+        # circuit breakers
+        self.postgresql_breaker: utilities.CircuitBreaker = utilities.CircuitBreaker(
+            "postgresql",
+            failures=(OSError, TimeoutError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError),
+            on_state_change=self._on_circuit_breaker_state_change,
+        )
+        self.redis_breaker: utilities.CircuitBreaker = utilities.CircuitBreaker(
+            "redis",
+            failures=(OSError, TimeoutError, aioredis.ConnectionError, aioredis.TimeoutError),
+            on_state_change=self._on_circuit_breaker_state_change,
+        )
         # cache
-        self.user_data_cache: dict[int, objects.UserData] = {}
-        self.guild_data_cache: dict[int, objects.GuildData] = {}
-        self.member_data_cache: dict[tuple[int, int], objects.MemberData] = {}
+        self.user_data_cache: utilities.LRUCache[int, objects.UserData] = utilities.LRUCache(
+            max_size=CONFIG.caches.user_data.max_size,
+            ttl=CONFIG.caches.user_data.ttl,
+        )
+        self.guild_data_cache: utilities.LRUCache[int, objects.GuildData] = utilities.LRUCache(
+            max_size=CONFIG.caches.guild_data.max_size,
+            ttl=CONFIG.caches.guild_data.ttl,
+        )
+        self.member_data_cache: utilities.LRUCache[tuple[int, int], objects.MemberData] = utilities.LRUCache(
+            max_size=CONFIG.caches.member_data.max_size,
+            ttl=CONFIG.caches.member_data.ttl,
+        )
+        self.prefix_cache: dict[int | None, tuple[str, ...]] = {}
+        self.search_cache: SearchCache = SearchCache(self)
+        # voice
+        self.progress_ticker: ProgressTicker = ProgressTicker(self)
+        self.idle_reaper: IdleReaper = IdleReaper(self)
+        self.player_executor: PlayerExecutor = PlayerExecutor()
+        # gateway
+        self._chunk_tasks: dict[int, asyncio.Task[None]] = {}
         # stats
         self.socket_stats: collections.Counter[str] = collections.Counter()
         self.command_stats: dict[str, collections.Counter[str]] = {
@@ -51,6 +99,7 @@ class CD(commands.AutoShardedBot):
             "successful": collections.Counter(),
             "failed":     collections.Counter(),
         }
+        self.command_timings: CommandTimings = CommandTimings()
 
     async def get_context(
         self,
@@ -60,35 +109,128 @@ class CD(commands.AutoShardedBot):
     ) -> custom.Context:
         return await super().get_context(origin, cls=custom.Context)
 
-    async def _get_prefix(self, message: discord.Message) -> list[str]:
-        if message.guild is not None:
-            guild_data = await objects.GuildData.get(self, message.guild.id)
-            prefixes = commands.when_mentioned_or(guild_data.prefix or CONFIG.discord.prefix)
+    async def on_shard_ready(self, shard_id: int) -> None:
+        # load the data for every guild on the shard up front, so that prefix lookups don't have to
+        ids = [guild.id for guild in self.guilds if guild.shard_id == shard_id]
+        try:
+            await objects.GuildData.preload(self, ids)
+        except Exception as error:
+            __log__.error(f"Error while preloading guild data for shard {shard_id}.", exc_info=error)
+        else:
+            __log__.info(f"Preloaded guild data for {len(ids)} guilds on shard {shard_id}.")
+
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        await objects.GuildData.preload(self, [guild.id])
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.prefix_cache.pop(guild.id, None)
+        self.guild_data_cache.remove(guild.id)
+        self.member_data_cache.remove_where(lambda key: key[1] == guild.id)
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.member_data_cache.remove((member.id, member.guild.id))
+
+    async def _chunk_guild(self, guild: discord.Guild) -> None:
+        try:
+            await guild.chunk()
+        except Exception as error:
+            __log__.warning(f"Couldn't chunk guild {guild.id}: {error}")
+        else:
+            __log__.debug(f"Chunked {len(guild.members)} members for guild {guild.id}.")
+        finally:
+            del self._chunk_tasks[guild.id]
+
+    def request_chunk(self, guild: discord.Guild) -> None:
+        # guilds aren't chunked at startup, so their members are requested the first time they're used instead
+        if guild.chunked or guild.id in self._chunk_tasks:
+            return
+        if not self.intents.members or not self._connection.member_cache_flags.joined:
+            return
+        self._chunk_tasks[guild.id] = asyncio.create_task(self._chunk_guild(guild))
+
+    def _compile_prefixes(self, prefix: str) -> tuple[str, ...]:
+        # same as commands.when_mentioned_or, but built once per guild rather than for every message
+        return f"<@{self.user.id}> ", f"<@!{self.user.id}> ", prefix  # pyright: ignore
+
+    async def _get_prefix(self, message: discord.Message) -> tuple[str, ...]:
+        guild_id = message.guild.id if message.guild is not None else None
+        if (prefixes := self.prefix_cache.get(guild_id)) is not None:
+            return prefixes
+        if guild_id is not None:
+            try:
+                guild_data = await objects.GuildData.get(self, guild_id)
+            except (utilities.CircuitOpen, *self.postgresql_breaker.failures):
+                # serve the default prefix while the database is unavailable, without caching it
+                return self._compile_prefixes(CONFIG.discord.prefix)
+            prefixes = self._compile_prefixes(guild_data.prefix or CONFIG.discord.prefix)
         else:
-            prefixes = commands.when_mentioned_or(CONFIG.discord.prefix)
-        return prefixes(self, message)
+            prefixes = self._compile_prefixes(CONFIG.discord.prefix)
+        self.prefix_cache[guild_id] = prefixes
+        return prefixes
+
+    async def process_commands(self, message: discord.Message) -> None:
+        if message.author.bot:
+            return
+        # most messages aren't commands, so skip building a context for the ones that can't be
+        prefixes = self.prefix_cache.get(message.guild.id if message.guild is not None else None)
+        if not message.content.startswith(prefixes or await self._get_prefix(message)):
+            return
+        if message.guild is not None:
+            self.request_chunk(message.guild)
+        ctx = await self.get_context(message)
+        await self.invoke(ctx)  # pyright: ignore
+
+    async def _on_circuit_breaker_state_change(
+        self,
+        breaker: utilities.CircuitBreaker,
+        state: enums.CircuitBreakerState,
+    ) -> None:
+        __log__.warning(f"The {breaker.name} circuit breaker is now {state.name.lower()}.")
+        if not self.webhooks:
+            return
+        await self.webhooks.queue(
+            "errors",
+            embed=utilities.embed(
+                colour=values.SUCCESS_COLOUR if state is enums.CircuitBreakerState.CLOSED else values.ERROR_COLOUR,
+                description=f"The **{breaker.name}** circuit breaker is now **{state.name.lower()}**.",
+            )
+        )
+
+    @staticmethod
+    async def _init_postgresql_connection(connection: asyncpg.Connection[asyncpg.Record]) -> None:
+        for query in CONFIG.connections.postgresql.init_queries:
+            await connection.execute(query)
 
     async def _connect_postgresql(self) -> None:
         try:
             __log__.debug("Attempting postgresql connection.")
-            database: Database = await asyncpg.create_pool(  # pyright: ignore
+            pool: asyncpg.Pool[asyncpg.Record] = await asyncpg.create_pool(  # pyright: ignore
                 CONFIG.connections.postgresql.dsn,
-                max_inactive_connection_lifetime=0,
-                min_size=1, max_size=5,
+                min_size=CONFIG.connections.postgresql.min_size,
+                max_size=CONFIG.connections.postgresql.max_size,
+                max_inactive_connection_lifetime=CONFIG.connections.postgresql.max_inactive_connection_lifetime,
+                statement_cache_size=CONFIG.connections.postgresql.statement_cache_size,
+                command_timeout=CONFIG.connections.postgresql.command_timeout,
+                init=self._init_postgresql_connection,
             )
         except Exception as error:
             __log__.critical("Error while connecting to postgresql.")
             raise error
         else:
             __log__.info("Successfully connected to postgresql.")
-            self.database = database
+            self.database = Database(
+                pool,
+                breaker=self.postgresql_breaker,
+                acquire_timeout=CONFIG.connections.postgresql.acquire_timeout,
+            )
 
     async def _connect_redis(self) -> None:
         try:
             __log__.debug("Attempting redis connection.")
             redis: Redis = await aioredis.Redis.from_url(
                 CONFIG.connections.redis.dsn,
-                decode_responses=True, retry_on_timeout=True
+                decode_responses=True, retry_on_timeout=True,
+                socket_timeout=CONFIG.connections.redis.socket_timeout,
             )
         except Exception as error:
             __log__.critical("Error while connecting to redis.")
@@ -98,25 +240,9 @@ class CD(commands.AutoShardedBot):
             self.redis = redis
 
     async def _connect_lavalink(self) -> None:
-        # TODO: Add support for multiple lavalink nodes.
-        for link in CONFIG.discord.ext.lava.links:
-            try:
-                __log__.debug("Attempting lavalink connection.")
-                lavalink: Lavalink = lava.Link(
-                    host=link.host,
-                    port=link.port,
-                    password=link.password,
-                    user_id=self.user.id,  # pyright: ignore
-                    spotify_client_id=CONFIG.connections.spotify.client_id,
-                    spotify_client_secret=CONFIG.connections.spotify.client_secret,
-                )
-                await lavalink.connect()
-            except Exception as error:
-                __log__.critical("Error while connecting to lavalink.")
-                raise error
-            else:
-                __log__.info("Successfully connected to lavalink.")
-                self.lavalink = lavalink
+        lavalink = NodePool(self)
+        await lavalink.connect()
+        self.lavalink = lavalink
 
     async def _load_extensions(self) -> None:
         await self.load_extension("jishaku")
@@ -129,17 +255,38 @@ class CD(commands.AutoShardedBot):
         self.session = aiohttp.ClientSession()
         self.webhooks = webhooks.Webhooks(self)
         await self._connect_postgresql()
+        self.data_writer = objects.DataWriter(self)
+        self.stats_recorder = StatsRecorder(self)
+        await self.stats_recorder.start()
         await self._connect_redis()
+        self.shared_cache = objects.SharedCache(self, ttl=CONFIG.caches.redis_ttl)
+        await self.shared_cache.start()
         await self._connect_lavalink()
+        self.player_snapshots = PlayerSnapshots(self)
+        self.player_snapshots.start()
+        self.progress_ticker.start()
         await self._load_extensions()
 
     async def close(self) -> None:
+        # stop the node health checks first, otherwise they fail once the session is closed and mark every node
+        # as down, which would start migrating players in the middle of shutting down
+        if self.lavalink:
+            self.lavalink.stop()
         await self.session.close()
         self.webhooks.cleanup()
+        if self.data_writer:
+            await self.data_writer.close()
+        if self.stats_recorder:
+            await self.stats_recorder.close()
         if self.database:
             await self.database.close()
+        if self.shared_cache:
+            await self.shared_cache.close()
+        if self.player_snapshots:
+            await self.player_snapshots.close()
         if self.redis:
             await self.redis.close()
+        self.progress_ticker.stop()
         if self.lavalink:
-            await self.lavalink._reset_state()
+            await self.lavalink.close()
         await super().close()
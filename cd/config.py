@@ -33,11 +33,15 @@ class DiscordExtLavaLink:
     host: str
     port: int
     password: str
+    identifier: str | None = None
+    region: str | None = None
 
 
 @dataclasses.dataclass
 class DiscordExtLava:
     links: list[DiscordExtLavaLink]
+    # only applies to voice channels with a region override
+    region_affinity: bool = False
 
 
 @dataclasses.dataclass
@@ -45,6 +49,15 @@ class DiscordExt:
     lava: DiscordExtLava
 
 
+@dataclasses.dataclass
+class DiscordGateway:
+    profile: Literal["minimal-music", "full"] = "full"
+    # overrides for single flags of the profile, e.g. {presences = false}
+    intents: dict[str, bool] = dataclasses.field(default_factory=dict)
+    member_cache: dict[str, bool] = dataclasses.field(default_factory=dict)
+    chunk_guilds_at_startup: bool = False
+
+
 @dataclasses.dataclass
 class Discord:
     prefix: str
@@ -53,16 +66,25 @@ class Discord:
     client_secret: str
     webhooks: DiscordWebhooks
     ext: DiscordExt
+    gateway: DiscordGateway = dataclasses.field(default_factory=DiscordGateway)
 
 
 @dataclasses.dataclass
 class PostgreSQL:
     dsn: str
+    min_size: int = 1
+    max_size: int = 5
+    max_inactive_connection_lifetime: int = 0
+    statement_cache_size: int = 100
+    command_timeout: int | None = 10
+    acquire_timeout: int | None = 10
+    init_queries: list[str] = dataclasses.field(default_factory=list)
 
 
 @dataclasses.dataclass
 class Redis:
     dsn: str
+    socket_timeout: int | None = 5
 
 
 @dataclasses.dataclass
@@ -84,6 +106,48 @@ class Connections:
     uploader: Uploader
 
 
+@dataclasses.dataclass
+class Cache:
+    max_size: int | None = None
+    ttl: int | None = None
+
+
+@dataclasses.dataclass
+class Caches:
+    user_data: Cache = dataclasses.field(default_factory=lambda: Cache(max_size=10_000, ttl=3600))
+    guild_data: Cache = dataclasses.field(default_factory=Cache)
+    member_data: Cache = dataclasses.field(default_factory=lambda: Cache(max_size=50_000, ttl=3600))
+    search_results: Cache = dataclasses.field(default_factory=lambda: Cache(max_size=5_000, ttl=3600))
+    redis_ttl: int | None = 86400
+    redis_search_ttl: int | None = 21600
+
+
+@dataclasses.dataclass
+class Voice:
+    ingestion_concurrency: int = 5
+    ingestion_batch_size: int = 25
+    snapshot_interval: int = 15
+    snapshot_ttl: int = 300
+    snapshot_restore_concurrency: int = 20
+    migration_concurrency: int = 20
+    progress_interval: int = 1
+    progress_max_interval: int = 8
+    progress_wheel_size: int = 10
+    progress_edit_budget: int = 5
+    idle_timeout: int = 300
+
+
+@dataclasses.dataclass
+class Stats:
+    # in days
+    retention: int = 30
+    # how many minutes of stats to keep in memory while they can't be written
+    max_pending_buckets: int = 1440
+    # in milliseconds
+    slow_command_threshold: int = 1000
+    slow_command_buffer: int = 50
+
+
 @dataclasses.dataclass
 class LoggingLevels:
     cd: Literal["NOTSET", "CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"] = "DEBUG"
@@ -128,6 +192,9 @@ class Config:
     general: General
     discord: Discord
     connections: Connections
+    caches: Caches = dataclasses.field(default_factory=Caches)
+    voice: Voice = dataclasses.field(default_factory=Voice)
+    stats: Stats = dataclasses.field(default_factory=Stats)
     logging: Logging = dataclasses.field(default_factory=Logging)
 
 
@@ -1,4 +1,5 @@
 from .cog import *
+from .command import *
 from .context import *
 from .help import *
 from .paginators import *
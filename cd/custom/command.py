@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import discord
+from discord.ext import commands
+
+
+if TYPE_CHECKING:
+    from .context import Context
+
+
+__all__ = [
+    "Command",
+    "command",
+]
+
+
+class Command(commands.Command[Any, ..., Any]):
+    """A command that records how long its checks, argument conversion, and callback take on the context."""
+
+    async def can_run(self, ctx: Context) -> bool:  # pyright: ignore [reportIncompatibleMethodOverride]
+        start = time.perf_counter()
+        try:
+            return await super().can_run(ctx)
+        finally:
+            ctx.timings.checks += (time.perf_counter() - start) * 1000
+
+    async def _parse_arguments(self, ctx: Context) -> None:  # pyright: ignore [reportIncompatibleMethodOverride]
+        start = time.perf_counter()
+        try:
+            await super()._parse_arguments(ctx)
+        finally:
+            ctx.timings.conversion += (time.perf_counter() - start) * 1000
+
+    async def invoke(self, ctx: Context) -> None:  # pyright: ignore [reportIncompatibleMethodOverride]
+        timings = ctx.timings
+        timings.started_at = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            # whatever isn't accounted for by the checks, conversion, or replies sent so far is the callback's
+            elapsed = (time.perf_counter() - timings.started_at) * 1000
+            timings.callback = max(elapsed - timings.checks - timings.conversion - timings.reply, 0.0)
+
+
+def command(name: str = discord.utils.MISSING, **attrs: Any) -> Callable[[Any], Command]:
+    return commands.command(name=name, cls=Command, **attrs)  # pyright: ignore
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import dataclasses
+import time
+from typing import TYPE_CHECKING, Any
 
+import discord
 from discord.ext import commands
 
 
@@ -10,11 +13,36 @@ if TYPE_CHECKING:
     from cd.modules.voice.custom.player import Player
 
 
-__all__ = ["Context"]
+__all__ = [
+    "Timings",
+    "Context",
+]
+
+
+@dataclasses.dataclass(slots=True)
+class Timings:
+    # all in milliseconds, apart from started_at which is a time.perf_counter() value
+    started_at: float | None = None
+    checks: float = 0.0
+    conversion: float = 0.0
+    callback: float = 0.0
+    reply: float = 0.0
+    finished: bool = False
 
 
 class Context(commands.Context["CD"]):
 
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.timings: Timings = Timings()
+
     @property
     def player(self) -> Player | None:
         return self.guild.voice_client if self.guild else None  # type: ignore
+
+    async def send(self, *args: Any, **kwargs: Any) -> discord.Message:  # pyright: ignore
+        start = time.perf_counter()
+        try:
+            return await super().send(*args, **kwargs)
+        finally:
+            self.timings.reply += (time.perf_counter() - start) * 1000
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from typing import Any
+
+import asyncpg
+
+from cd import utilities
+
+
+__all__ = ["Database"]
+
+type Pool = asyncpg.Pool[asyncpg.Record]
+type Connection = asyncpg.pool.PoolConnectionProxy[asyncpg.Record]
+
+
+class Database:
+    """Wraps an asyncpg pool, recording how long each query takes and how long connections take to acquire."""
+
+    def __init__(self, pool: Pool, /, *, breaker: utilities.CircuitBreaker, acquire_timeout: int | None) -> None:
+        self._pool: Pool = pool
+        self.breaker: utilities.CircuitBreaker = breaker
+        self.acquire_timeout: int | None = acquire_timeout
+        # stats
+        self.query_stats: collections.defaultdict[str, utilities.Histogram] = \
+            collections.defaultdict(utilities.Histogram)
+        self.acquire_stats: utilities.Histogram = utilities.Histogram()
+        self.in_use: int = 0
+        self.max_in_use: int = 0
+
+    def __repr__(self) -> str:
+        return f"<Database: size={self.size}, idle={self.idle}, in_use={self.in_use}>"
+
+    @property
+    def size(self) -> int:
+        return self._pool.get_size()
+
+    @property
+    def idle(self) -> int:
+        return self._pool.get_idle_size()
+
+    @property
+    def max_size(self) -> int:
+        return self._pool.get_max_size()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Connection]:
+        # fail fast while the database is unavailable, rather than waiting for every query to time out
+        async with self.breaker:
+            start = time.perf_counter()
+            async with self._pool.acquire(timeout=self.acquire_timeout) as connection:  # pyright: ignore
+                self.acquire_stats.record((time.perf_counter() - start) * 1000)
+                self.in_use += 1
+                self.max_in_use = max(self.max_in_use, self.in_use)
+                try:
+                    yield connection  # pyright: ignore
+                finally:
+                    self.in_use -= 1
+
+    @contextlib.contextmanager
+    def _record(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.query_stats[name].record((time.perf_counter() - start) * 1000)
+
+    async def execute(
+        self,
+        query: str,
+        *args: Any,
+        name: str | None = None,
+        timeout: float | None = None,
+    ) -> str:
+        async with self.acquire() as connection:
+            with self._record(name or query):
+                return await connection.execute(query, *args, timeout=timeout)
+
+    async def executemany(
+        self,
+        query: str,
+        args: Iterable[Sequence[Any]],
+        /, *,
+        name: str | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        async with self.acquire() as connection:
+            with self._record(name or query):
+                await connection.executemany(query, args, timeout=timeout)
+
+    async def fetch(
+        self,
+        query: str,
+        *args: Any,
+        name: str | None = None,
+        timeout: float | None = None,
+    ) -> list[asyncpg.Record]:
+        async with self.acquire() as connection:
+            with self._record(name or query):
+                return await connection.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(
+        self,
+        query: str,
+        *args: Any,
+        name: str | None = None,
+        timeout: float | None = None,
+    ) -> asyncpg.Record | None:
+        async with self.acquire() as connection:
+            with self._record(name or query):
+                return await connection.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(
+        self,
+        query: str,
+        *args: Any,
+        name: str | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        async with self.acquire() as connection:
+            with self._record(name or query):
+                return await connection.fetchval(query, *args, timeout=timeout)
+
+    async def close(self) -> None:
+        await self._pool.close()
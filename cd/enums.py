@@ -4,6 +4,8 @@ import enum
 __all__ = [
     "Environment",
     "DateTimeFormat",
+    "CircuitBreakerState",
+    "LoopMode",
 ]
 
 
@@ -47,3 +49,15 @@ class DateTimeFormat(enum.Enum):
     SHORT_DATE_WITH_SIMPLE_TIME_AND_SECONDS = "ddd[,] Do MMM YYYY [at] hh:mm:ss A"
     SHORTEST_DATE_WITH_SIMPLE_TIME = "ddd[,] D MMM YYYY [at] hh:mm A"
     SHORTEST_DATE_WITH_SIMPLE_TIME_AND_SECONDS = "ddd[,] D MMM YYYY [at] hh:mm:ss A"
+
+
+class CircuitBreakerState(enum.Enum):
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class LoopMode(enum.Enum):
+    NONE = 0
+    TRACK = 1
+    QUEUE = 2
@@ -36,8 +36,7 @@ class Errors(custom.Cog, name="Errors"):
             description=f"{user_info}{guild_info}{channel_info}{message_info}",
         )
 
-    @custom.Cog.listener("on_command_error")
-    async def on_command_error(self, ctx: custom.Context, error: commands.CommandError) -> None:
+    async def _handle_error(self, ctx: custom.Context, error: commands.CommandError) -> None:
         if isinstance(error, exceptions.EmbedResponse):
             await ctx.reply(
                 embed=error.embed,
@@ -66,7 +65,15 @@ class Errors(custom.Cog, name="Errors"):
         else:
             await original(error, ctx)
 
-    @commands.command(name="error")
+    @custom.Cog.listener("on_command_error")
+    async def on_command_error(self, ctx: custom.Context, error: commands.CommandError) -> None:
+        try:
+            await self._handle_error(ctx, error)
+        finally:
+            # command timings include the reply, which for errors and responses is only sent here
+            self.bot.command_timings.finish(ctx)
+
+    @custom.command(name="error")
     async def error(self, ctx: custom.Context) -> None:
         """Raises an error to test the error handler."""
         raise ValueError("This is a test error.")
@@ -1,6 +1,7 @@
 import discord
+from discord.ext import commands
 
-from cd import custom
+from cd import custom, exceptions, utilities, values
 
 
 __all__ = ["Meta"]
@@ -16,3 +17,32 @@ class Meta(custom.Cog, name="Meta"):
             return
         await self.bot.process_commands(after)
 
+    @custom.command(name="drain-node", aliases=["drain_node", "drain"])
+    @commands.is_owner()
+    async def drain_node(self, ctx: custom.Context, identifier: str) -> None:
+        """Migrates every player away from a lavalink node and stops new players from using it."""
+        if (node := self.bot.lavalink.nodes.get(identifier)) is None:
+            raise exceptions.EmbedResponse(
+                description=f"There is no lavalink node with the identifier **{utilities.truncate(identifier, 25)}**.",
+                colour=values.ERROR_COLOUR,
+            )
+        migrated = await self.bot.lavalink.drain(node)
+        raise exceptions.EmbedResponse(
+            description=f"Drained **{node.identifier}**, migrated **{migrated}** {utilities.plural('player', migrated)}.",
+            colour=values.SUCCESS_COLOUR,
+        )
+
+    @custom.command(name="undrain-node", aliases=["undrain_node", "undrain"])
+    @commands.is_owner()
+    async def undrain_node(self, ctx: custom.Context, identifier: str) -> None:
+        """Lets new players use a lavalink node that was previously drained."""
+        if (node := self.bot.lavalink.nodes.get(identifier)) is None:
+            raise exceptions.EmbedResponse(
+                description=f"There is no lavalink node with the identifier **{utilities.truncate(identifier, 25)}**.",
+                colour=values.ERROR_COLOUR,
+            )
+        self.bot.lavalink.undrain(node)
+        raise exceptions.EmbedResponse(
+            description=f"New players can use **{node.identifier}** again.",
+            colour=values.SUCCESS_COLOUR,
+        )
@@ -1,56 +1,343 @@
+import datetime as dt
+import re
+from collections.abc import Sequence
+from typing import Any
+
+import discord
 from discord.ext import commands, paginators
 
-from cd import custom
+from cd import custom, enums, exceptions, utilities, values
+from cd.config import CONFIG
+from cd.modules.stats.timings import PHASES
+from cd.modules.voice.custom import Player
 
 
 __all__ = ["Stats"]
 
 
+def _build_table(columns: Sequence[str], rows: Sequence[Sequence[str]]) -> tuple[str, list[str], str]:
+    # calculate the width of each column
+    widths = [max([len(column), *(len(row[index]) for row in rows)]) for index, column in enumerate(columns)]
+    bars = ["═" * width for width in widths]
+    # format the items, header, and footer for the table
+    items = [
+        "║ " + " ║ ".join(
+            f"{value:^{width}}" if index == 0 else f"{value:>{width}}"
+            for index, (value, width) in enumerate(zip(row, widths))
+        ) + " ║"
+        for row in rows
+    ]
+    header = f"╔═{"═╦═".join(bars)}═╗\n" \
+             f"║ {" ║ ".join(f"{column:^{width}}" for column, width in zip(columns, widths))} ║\n" \
+             f"╠═{"═╬═".join(bars)}═╣"
+    footer = f"╚═{"═╩═".join(bars)}═╝"
+    return header, items, footer
+
+
+def _format_histogram(histogram: utilities.Histogram) -> list[str]:
+    return [
+        str(histogram.count),
+        f"{histogram.p50:.2f}",
+        f"{histogram.p95:.2f}",
+        f"{histogram.p99:.2f}",
+        f"{histogram.max:.2f}",
+    ]
+
+
+_WINDOW_REGEX: re.Pattern[str] = re.compile(
+    r"^(?P<amount>[0-9]+)(?P<unit>[mhdw])$",
+    re.IGNORECASE
+)
+_UNITS_TO_MINUTES: dict[str, int] = {
+    "m": 1,
+    "h": 60,
+    "d": 60 * 24,
+    "w": 60 * 24 * 7,
+}
+
+
+def _parse_window(window: str) -> int:
+    if (match := _WINDOW_REGEX.fullmatch(window)) is None or (amount := int(match["amount"])) == 0:
+        raise exceptions.EmbedResponse(
+            description=f"**{utilities.truncate(window, 25)}** isn't a valid window, try something like **1h**, "
+                        f"**24h**, or **7d**.",
+            colour=values.ERROR_COLOUR,
+        )
+    return amount * _UNITS_TO_MINUTES[match["unit"].lower()]
+
+
 class Stats(custom.Cog, name="Stats"):
     emoji = "📊"
     description = "Commands for tracking and displaying bot statistics."
 
     @custom.Cog.listener("on_socket_event_type")
     async def track_socket_events(self, event_type: str) -> None:
+        # this runs for every gateway event, so it must never do more than count them
         self.bot.socket_stats[event_type] += 1
+        self.bot.stats_recorder.current["socket", event_type] += 1
 
     @custom.Cog.listener("on_command")
     async def track_total_commands(self, ctx: custom.Context) -> None:
         if ctx.command is None:
             return
         self.bot.command_stats["total"][ctx.command.qualified_name] += 1
+        self.bot.stats_recorder.current["commands.total", ctx.command.qualified_name] += 1
 
     @custom.Cog.listener("on_command_completion")
     async def track_successful_commands(self, ctx: custom.Context) -> None:
         if ctx.command is None:
             return
         self.bot.command_stats["successful"][ctx.command.qualified_name] += 1
+        self.bot.stats_recorder.current["commands.successful", ctx.command.qualified_name] += 1
+        self.bot.command_timings.finish(ctx)
 
     @custom.Cog.listener("on_command_error")
     async def track_failed_commands(self, ctx: custom.Context, _: Exception) -> None:
         if ctx.command is None:
             return
         self.bot.command_stats["failed"][ctx.command.qualified_name] += 1
+        self.bot.stats_recorder.current["commands.failed", ctx.command.qualified_name] += 1
 
-    @commands.command(name="socket-stats", aliases=["socket_stats", "ss"])
+    @custom.command(name="socket-stats", aliases=["socket_stats", "ss"])
     async def socket_stats(self, ctx: custom.Context) -> None:
         """Display the bot's socket event statistics."""
-        # calculate 'event' column width
-        event_column_width = max(map(len, self.bot.socket_stats.keys()))
-        event_column_bar = "═" * event_column_width
-        # calculate 'count' column width
-        count_column_width = max(5, max(map(len, map(str, self.bot.socket_stats.values()))))
-        count_column_bar = "═" * count_column_width
-        # format the items, header, and footer for the table
+        header, items, footer = _build_table(
+            ["Event", "Count"],
+            [
+                [event, str(count)]
+                for event, count in sorted(self.bot.socket_stats.items(), key=lambda x: x[1], reverse=True)
+            ]
+        )
+        # paginate the events and their counts
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="socket-rates", aliases=["socket_rates", "sr"])
+    async def socket_rates(self, ctx: custom.Context, window: str = "1h") -> None:
+        """Display the bot's socket event rates over a window of time, such as 1h, 24h, or 7d."""
+        minutes = _parse_window(window)
+        totals = await self.bot.stats_recorder.totals(
+            ["socket"], discord.utils.utcnow() - dt.timedelta(minutes=minutes)
+        )
+        header, items, footer = _build_table(
+            ["Event", "Count", "Per minute", "Per hour"],
+            [
+                [event, str(count), f"{count / minutes:.2f}", f"{count / minutes * 60:.1f}"]
+                for (_, event), count in totals.most_common()
+            ]
+        )
+        header = f"Socket events over the last {utilities.format_seconds(minutes * 60)}\n" \
+                 f"{header}"
+        # paginate the events and their rates
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="command-rates", aliases=["command_rates", "cr"])
+    async def command_rates(self, ctx: custom.Context, window: str = "24h") -> None:
+        """Display the bot's command usage rates over a window of time, such as 1h, 24h, or 7d."""
+        minutes = _parse_window(window)
+        totals = await self.bot.stats_recorder.totals(
+            ["commands.total", "commands.successful", "commands.failed"],
+            discord.utils.utcnow() - dt.timedelta(minutes=minutes)
+        )
+        names = sorted(
+            {name for _, name in totals},
+            key=lambda name: totals["commands.total", name],
+            reverse=True,
+        )
+        header, items, footer = _build_table(
+            ["Command", "Total", "Successful", "Failed", "Per hour"],
+            [
+                [
+                    name, str(totals["commands.total", name]), str(totals["commands.successful", name]),
+                    str(totals["commands.failed", name]), f"{totals["commands.total", name] / minutes * 60:.2f}",
+                ]
+                for name in names
+            ]
+        )
+        header = f"Commands over the last {utilities.format_seconds(minutes * 60)}\n" \
+                 f"{header}"
+        # paginate the commands and their rates
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="database-stats", aliases=["database_stats", "ds"])
+    @commands.is_owner()
+    async def database_stats(self, ctx: custom.Context) -> None:
+        """Display the bot's database pool and query latency statistics."""
+        database = self.bot.database
+        header, items, footer = _build_table(
+            ["Query", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"],
+            [
+                ["acquire", *_format_histogram(database.acquire_stats)],
+                *(
+                    [utilities.truncate(name, 30), *_format_histogram(histogram)]
+                    for name, histogram in sorted(
+                        database.query_stats.items(), key=lambda x: x[1].total, reverse=True
+                    )
+                ),
+            ]
+        )
+        header = f"Pool: {database.size}/{database.max_size} connections, {database.idle} idle, " \
+                 f"{database.in_use} in use ({database.max_in_use} at most)\n" \
+                 f"{header}"
+        # paginate the queries and their latencies
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="command-stats", aliases=["command_stats", "cms"])
+    @commands.is_owner()
+    async def command_stats(self, ctx: custom.Context) -> None:
+        """Display how long each command takes, split into checks, conversion, callback, and reply."""
+        timings = self.bot.command_timings
+        header, items, footer = _build_table(
+            ["Command", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)",
+             *(f"{phase.capitalize()} p95" for phase in PHASES[1:])],
+            [
+                [
+                    utilities.truncate(name, 20), *_format_histogram(histograms["total"]),
+                    *(f"{histograms[phase].p95:.2f}" for phase in PHASES[1:]),
+                ]
+                for name, histograms in sorted(
+                    timings.histograms.items(), key=lambda x: x[1]["total"].p95, reverse=True
+                )
+            ]
+        )
+        footer = f"{footer}\n" \
+                 f"{len(timings.slow)} slow {utilities.plural("invocation", len(timings.slow))} recorded, " \
+                 f"use 'slow-commands' to see them"
+        # paginate the commands and their timings
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="slow-commands", aliases=["slow_commands", "slc"])
+    @commands.is_owner()
+    async def slow_commands(self, ctx: custom.Context) -> None:
+        """Display the slowest recent command invocations."""
+        timings = self.bot.command_timings
+        if not timings.slow:
+            raise exceptions.EmbedResponse(
+                description="There are no slow command invocations recorded.",
+                colour=values.ERROR_COLOUR,
+            )
+        # newest first, each invocation takes up three lines
         items = [
-            f"║ {event:^{event_column_width}} ║ {count:>{count_column_width}} ║"
-            for event, count in sorted(self.bot.socket_stats.items(), key=lambda x: x[1], reverse=True)
+            f"{utilities.format_date_and_or_time(
+                invocation.invoked_at,
+                format=enums.DateTimeFormat.SHORTEST_DATE_WITH_TIME_AND_SECONDS,
+            )} {invocation.command}{" (failed)" if invocation.failed else ""}: "
+            f"{" | ".join(f"{phase} {invocation.timings[phase]:.2f}ms" for phase in PHASES)}\n"
+            f"  user {invocation.user_id}, guild {invocation.guild_id}, channel {invocation.channel_id}\n"
+            f"  {utilities.truncate(invocation.content, 80)}"
+            for invocation in reversed(timings.slow)
         ]
-        header = f"╔═{event_column_bar}═╦═{count_column_bar}═╗\n" \
-                 f"║ {"Event":^{event_column_width}} ║ {"Count":^{count_column_width}} ║\n" \
-                 f"╠═{event_column_bar}═╬═{count_column_bar}═╣"
-        footer = f"╚═{event_column_bar}═╩═{count_column_bar}═╝"
-        # paginate the events and their counts
+        # paginate the invocations
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=5,
+            controller=custom.PaginatorController,
+            header=f"Invocations slower than {CONFIG.stats.slow_command_threshold}ms\n",
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="cache-stats", aliases=["cache_stats", "cs"])
+    @commands.is_owner()
+    async def cache_stats(self, ctx: custom.Context) -> None:
+        """Display the bot's cache statistics."""
+        caches: dict[str, utilities.LRUCache[Any, Any]] = {
+            "users":    self.bot.user_data_cache,
+            "guilds":   self.bot.guild_data_cache,
+            "members":  self.bot.member_data_cache,
+            "searches": self.bot.search_cache.cache,
+        }
+        header, items, footer = _build_table(
+            ["Cache", "Size", "Hits", "Misses", "Hit rate", "Evictions", "Coalesced"],
+            [
+                [
+                    name, str(len(cache)), str(cache.hits), str(cache.misses), f"{cache.hit_rate:.1%}",
+                    str(cache.evictions), str(cache.coalesced),
+                ]
+                for name, cache in caches.items()
+            ]
+        )
+        search_cache = self.bot.search_cache
+        redis_lookups = search_cache.redis_hits + search_cache.redis_misses
+        footer = f"{footer}\n" \
+                 f"Search redis hits: {search_cache.redis_hits}/{redis_lookups} " \
+                 f"({search_cache.redis_hits / redis_lookups if redis_lookups else 0:.1%})"
+        # paginate the caches and their stats
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=items,
+            items_per_page=20,
+            controller=custom.PaginatorController,
+            header=header,
+            footer=footer,
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="player-stats", aliases=["player_stats", "ps"])
+    @commands.is_owner()
+    async def player_stats(self, ctx: custom.Context) -> None:
+        """Display the gaps between tracks for each player."""
+        players = [player for player in self.bot.voice_clients if isinstance(player, Player)]
+        header, items, footer = _build_table(
+            ["Guild", "Gaps", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)", "Prefetched"],
+            [
+                [
+                    str(player.guild.id), *_format_histogram(player.gap_stats),
+                    f"{player.prefetch_hits}/{player.prefetch_hits + player.prefetch_misses}",
+                ]
+                for player in sorted(players, key=lambda player: player.gap_stats.max, reverse=True)
+            ]
+        )
+        ticker = self.bot.progress_ticker
+        reaper = self.bot.idle_reaper
+        executor = self.bot.player_executor
+        header = f"Progress ticker: {ticker.interval:.1f}s interval, {ticker.lag_stats.p95:.2f}ms p95 lag, " \
+                 f"{ticker.edits} edits, {ticker.skipped} skipped, {ticker.deferred} deferred\n" \
+                 f"Idle reaper: {reaper.reaped} reaped, {reaper.pending} pending, " \
+                 f"{utilities.format_seconds(reaper.saved)} of node time saved\n" \
+                 f"Executor: {executor.busy} busy guilds, {executor.executed} operations, " \
+                 f"{executor.collapsed} collapsed\n" \
+                 f"{header}"
+        # paginate the players and their gaps
         await paginators.TextPaginator(
             ctx=ctx,
             items=items,
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime as dt
+import logging
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+import asyncpg
+import discord
+from discord.ext import tasks
+
+from cd import utilities
+from cd.config import CONFIG
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["StatsRecorder"]
+__log__ = logging.getLogger("cd.modules.stats.recorder")
+
+type Bucket = collections.Counter[tuple[str, str]]
+
+_CREATE_TABLE_QUERY: str = """
+CREATE TABLE IF NOT EXISTS stats (
+    minute TIMESTAMP WITH TIME ZONE NOT NULL,
+    kind   TEXT                     NOT NULL,
+    name   TEXT                     NOT NULL,
+    count  BIGINT                   NOT NULL,
+    PRIMARY KEY (minute, kind, name)
+)
+"""
+_UPSERT_QUERY: str = \
+    "INSERT INTO stats (minute, kind, name, count) VALUES ($1, $2, $3, $4) " \
+    "ON CONFLICT (minute, kind, name) DO UPDATE SET count = stats.count + EXCLUDED.count"
+
+
+def _truncate(datetime: dt.datetime) -> dt.datetime:
+    return datetime.replace(second=0, microsecond=0)
+
+
+class StatsRecorder:
+    """Counts socket events and command uses in per-minute buckets, and writes them to the database in batches.
+
+    Listeners only ever increment the current bucket, which is swapped for an empty one at the start of every
+    minute. Swapped buckets are kept in memory until they've been written, so the database being unavailable only
+    delays them, up to a limit.
+    """
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self.current: Bucket = collections.Counter()
+        self._minute: dt.datetime = _truncate(discord.utils.utcnow())
+        self._pending: collections.deque[tuple[dt.datetime, Bucket]] = \
+            collections.deque(maxlen=CONFIG.stats.max_pending_buckets)
+        self._lock: asyncio.Lock = asyncio.Lock()
+        # stats
+        self.written: int = 0
+        self.dropped: int = 0
+
+    def __repr__(self) -> str:
+        return f"<StatsRecorder: pending={len(self._pending)}, written={self.written}, dropped={self.dropped}>"
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _swap(self) -> None:
+        bucket, self.current = self.current, collections.Counter()
+        minute, self._minute = self._minute, _truncate(discord.utils.utcnow())
+        if not bucket:
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+            __log__.warning(f"Dropped the stats bucket for {self._pending[0][0]} because too many are unwritten.")
+        self._pending.append((minute, bucket))
+
+    @tasks.loop(minutes=1)
+    async def _loop(self) -> None:
+        self._swap()
+        try:
+            await self.flush()
+            # prune old buckets once an hour
+            if self._minute.minute == 0:
+                await self._bot.database.execute(
+                    "DELETE FROM stats WHERE minute < $1",
+                    self._minute - dt.timedelta(days=CONFIG.stats.retention),
+                    name="stats.delete",
+                )
+        except Exception as error:
+            __log__.error("Error while writing stats.", exc_info=error)
+
+    @_loop.before_loop
+    async def _before_loop(self) -> None:
+        # line the swaps up with the start of each minute
+        await discord.utils.sleep_until(self._minute + dt.timedelta(minutes=1))
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+            rows = [
+                (minute, kind, name, count)
+                for minute, bucket in batch
+                for (kind, name), count in bucket.items()
+            ]
+            try:
+                await self._bot.database.executemany(_UPSERT_QUERY, rows, name="stats.upsert")
+            except Exception:
+                # put the batch back in front of anything swapped in the meantime, dropping the oldest if it's full
+                self._pending = collections.deque([*batch, *self._pending], maxlen=self._pending.maxlen)
+                raise
+            self.written += len(rows)
+            __log__.debug(f"Wrote {len(rows)} stats {utilities.plural("row", len(rows))}.")
+
+    async def totals(self, kinds: Iterable[str], since: dt.datetime) -> collections.Counter[tuple[str, str]]:
+        kinds = list(kinds)
+        # held so that a batch being written is either in the database or in memory, but never neither
+        async with self._lock:
+            records: list[asyncpg.Record] = await self._bot.database.fetch(
+                "SELECT kind, name, sum(count) AS count FROM stats WHERE kind = ANY($1::text[]) AND minute >= $2 "
+                "GROUP BY kind, name",
+                kinds,
+                _truncate(since),
+                name="stats.select",
+            )
+            totals: collections.Counter[tuple[str, str]] = collections.Counter(
+                {(record["kind"], record["name"]): record["count"] for record in records}
+            )
+            # include the buckets that haven't been written yet
+            for minute, bucket in [*self._pending, (self._minute, self.current)]:
+                if minute < _truncate(since):
+                    continue
+                for (kind, name), count in bucket.items():
+                    if kind in kinds:
+                        totals[kind, name] += count
+        return totals
+
+    async def start(self) -> None:
+        try:
+            await self._bot.database.execute(_CREATE_TABLE_QUERY, name="stats.create")
+        except Exception as error:
+            __log__.error("Error while creating the stats table.", exc_info=error)
+        self._loop.start()
+
+    async def close(self) -> None:
+        self._loop.stop()
+        # the current minute is written as it is, later buckets for it are added on top
+        self._swap()
+        # shutting down has to carry on even if the database is unavailable, so the buckets are only logged as lost
+        try:
+            await self.flush()
+        except Exception as error:
+            __log__.error(
+                f"Error while writing stats on close, {len(self._pending)} "
+                f"{utilities.plural("bucket", len(self._pending))} were lost.",
+                exc_info=error,
+            )
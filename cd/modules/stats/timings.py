@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import datetime as dt
+import logging
+import time
+
+import discord
+
+from cd import custom, utilities
+from cd.config import CONFIG
+
+
+__all__ = [
+    "PHASES",
+    "SlowInvocation",
+    "CommandTimings",
+]
+__log__ = logging.getLogger("cd.modules.stats.timings")
+
+PHASES: tuple[str, ...] = ("total", "checks", "conversion", "callback", "reply")
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SlowInvocation:
+    command: str
+    timings: dict[str, float]
+    failed: bool
+    user_id: int
+    guild_id: int | None
+    channel_id: int
+    content: str
+    invoked_at: dt.datetime
+
+
+class CommandTimings:
+    """Records how long each command takes from being invoked until its reply has been sent, split into phases.
+
+    Every command has a histogram per phase, and invocations slower than the configured threshold are kept in a
+    ring buffer along with where and how they were invoked.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: collections.defaultdict[str, dict[str, utilities.Histogram]] = \
+            collections.defaultdict(lambda: {phase: utilities.Histogram() for phase in PHASES})
+        self.slow: collections.deque[SlowInvocation] = \
+            collections.deque(maxlen=CONFIG.stats.slow_command_buffer)
+
+    def __repr__(self) -> str:
+        return f"<CommandTimings: commands={len(self.histograms)}, slow={len(self.slow)}>"
+
+    def finish(self, ctx: custom.Context) -> None:
+        timings = ctx.timings
+        # commands that weren't timed, or that have already been recorded, are skipped
+        if ctx.command is None or timings.started_at is None or timings.finished:
+            return
+        timings.finished = True
+        phases = {
+            "total":      (time.perf_counter() - timings.started_at) * 1000,
+            "checks":     timings.checks,
+            "conversion": timings.conversion,
+            "callback":   timings.callback,
+            "reply":      timings.reply,
+        }
+        histograms = self.histograms[ctx.command.qualified_name]
+        for phase, value in phases.items():
+            histograms[phase].record(value)
+        if phases["total"] < CONFIG.stats.slow_command_threshold:
+            return
+        self.slow.append(
+            SlowInvocation(
+                command=ctx.command.qualified_name,
+                timings=phases,
+                failed=ctx.command_failed,
+                user_id=ctx.author.id,
+                guild_id=ctx.guild.id if ctx.guild else None,
+                channel_id=ctx.channel.id,
+                content=ctx.message.content,
+                invoked_at=discord.utils.utcnow(),
+            )
+        )
+        __log__.debug(f"Command '{ctx.command.qualified_name}' took {phases["total"]:.2f}ms.")
@@ -1,11 +1,14 @@
+from __future__ import annotations
+
 from typing import Literal
 
-from discord.ext import commands, lava
+import discord
+from discord.ext import commands, lava, paginators
 from discord.ext.lava.types.common import VoiceChannel
 
-from cd import custom, exceptions, values
+from cd import custom, enums, exceptions, utilities, values
 from cd.modules.voice.checks import are_bot_and_user_in_same_voice_channel, is_user_in_voice_channel
-from cd.modules.voice.custom import Player
+from cd.modules.voice.custom import Ingestion, Player
 
 
 __all__ = ["VoiceControls"]
@@ -20,91 +23,269 @@ class VoiceControls(custom.Cog, name="Voice Controls"):
             raise commands.NoPrivateMessage()
         return True
 
+    @custom.Cog.listener("on_voice_state_update")
+    async def on_voice_state_update(
+        self,
+        member: discord.Member,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+    ) -> None:
+        if isinstance(player := member.guild.voice_client, Player):
+            self.bot.idle_reaper.check(player)
+
     @custom.Cog.listener("on_lava_track_start")
-    async def on_lava_track_start(self, player: Player, event: lava.TrackStartEvent) -> None:
-        if not player._channel:
-            return
-        await player._channel.send(f"Playing {event.track.title}.")
+    async def on_lava_track_start(self, player: Player, _: lava.TrackStartEvent) -> None:
+        player.handle_track_start()
+        player.now_playing.update()
+        self.bot.idle_reaper.check(player)
 
     @custom.Cog.listener("on_lava_track_end")
     async def on_lava_track_end(self, player: Player, event: lava.TrackEndEvent) -> None:
-        if not player._channel:
+        # tracks that were replaced or stopped by a command have already been dealt with
+        if event.reason not in ("finished", "loadFailed"):
             return
-        await player._channel.send(f"Finished {event.track.title}.")
+        await self.bot.player_executor.run(
+            player.guild.id,
+            lambda: player.handle_track_end(failed=event.reason == "loadFailed"),
+        )
+        player.now_playing.update()
+        self.bot.idle_reaper.check(player)
 
-    @commands.command(name="join", aliases=["connect", "summon"])
+    @staticmethod
+    def _get_player(ctx: custom.Context) -> Player:
+        # operations can wait behind others, so the player they were queued for might be gone by the time they run
+        if not ctx.player or not ctx.player.channel:
+            raise exceptions.EmbedResponse(
+                description="I am not connected to a voice channel.",
+                colour=values.ERROR_COLOUR,
+            )
+        return ctx.player
+
+    @custom.command(name="join", aliases=["connect", "summon"])
     @is_user_in_voice_channel()
     async def join(self, ctx: custom.Context) -> None:
         """Connects the bot to the voice channel of the user."""
         # TODO: is exception control flow cringe?
         author_channel: VoiceChannel = ctx.author.voice.channel  # pyright: ignore
-        if ctx.player:
-            if ctx.player.channel:
-                if ctx.player.channel == author_channel:
+
+        async def operation() -> None:
+            if ctx.player:
+                if ctx.player.channel:
+                    if ctx.player.channel == author_channel:
+                        raise exceptions.EmbedResponse(
+                            description="I am already connected to your voice channel.",
+                            colour=values.ERROR_COLOUR,
+                        )
+                    await ctx.player.move_to(author_channel)
                     raise exceptions.EmbedResponse(
-                        description="I am already connected to your voice channel.",
-                        colour=values.ERROR_COLOUR,
+                        description=f"I've moved to {author_channel.mention}.",
+                        colour=values.SUCCESS_COLOUR,
                     )
-                await ctx.player.move_to(author_channel)
+                await ctx.player.connect(channel=author_channel)
                 raise exceptions.EmbedResponse(
-                    description=f"I've moved to {author_channel.mention}.",
+                    description=f"I've reconnected to {author_channel.mention}.",
                     colour=values.SUCCESS_COLOUR,
                 )
-            await ctx.player.connect(channel=author_channel)
+            if (node := self.bot.lavalink.select(region=author_channel.rtc_region)) is None:
+                raise exceptions.EmbedResponse(
+                    description="There are no audio nodes available right now, try again later.",
+                    colour=values.ERROR_COLOUR,
+                )
+            await author_channel.connect(cls=Player(link=node.link))
+            raise exceptions.EmbedResponse(
+                description=f"I've connected to {author_channel.mention}.",
+                colour=values.SUCCESS_COLOUR,
+            )
+
+        await self.bot.player_executor.run(author_channel.guild.id, operation, key=("join", author_channel.id))
+
+    @custom.command(name="leave", aliases=["disconnect", "dc"])
+    @are_bot_and_user_in_same_voice_channel()
+    async def leave(self, ctx: custom.Context) -> None:
+        """Disconnects the bot from the voice channel."""
+
+        async def operation() -> None:
+            player = self._get_player(ctx)
+            channel: VoiceChannel = player.channel  # pyright: ignore
+            player.cancel_ingestions()
+            await player.disconnect()
+            raise exceptions.EmbedResponse(
+                description=f"I've disconnected from {channel.mention}.",
+                colour=values.SUCCESS_COLOUR,
+            )
+
+        await self.bot.player_executor.run(ctx.guild.id, operation, key="leave")  # pyright: ignore
+
+    @custom.command(name="pause")
+    @are_bot_and_user_in_same_voice_channel()
+    async def pause(self, ctx: custom.Context) -> None:
+        """Pauses the current track."""
+
+        async def operation() -> None:
+            player = self._get_player(ctx)
+            if player.is_paused():
+                raise exceptions.EmbedResponse(
+                    description="The player is already paused.",
+                    colour=values.ERROR_COLOUR,
+                )
+            await player.pause()
+            raise exceptions.EmbedResponse(
+                description="The player has been paused.",
+                colour=values.SUCCESS_COLOUR,
+            )
+
+        await self.bot.player_executor.run(ctx.guild.id, operation, key="pause")  # pyright: ignore
+
+    @custom.command(name="resume")
+    @are_bot_and_user_in_same_voice_channel()
+    async def resume(self, ctx: custom.Context) -> None:
+        """Resumes the current track."""
+
+        async def operation() -> None:
+            player = self._get_player(ctx)
+            if not player.is_paused():
+                raise exceptions.EmbedResponse(
+                    description="The player is not paused.",
+                    colour=values.ERROR_COLOUR,
+                )
+            await player.resume()
+            raise exceptions.EmbedResponse(
+                description="The player has been resumed.",
+                colour=values.SUCCESS_COLOUR,
+            )
+
+        await self.bot.player_executor.run(ctx.guild.id, operation, key="resume")  # pyright: ignore
+
+    @custom.command(name="play")
+    @are_bot_and_user_in_same_voice_channel()
+    async def play(self, ctx: custom.Context, *, search: str) -> None:
+        """Adds a track, or every track in a playlist, to the queue."""
+        guild: discord.Guild = ctx.guild  # pyright: ignore
+        player: Player = ctx.player  # pyright: ignore
+        player.now_playing.channel = ctx.channel
+        if not (tracks := await self.bot.search_cache.search(search)):
+            raise exceptions.EmbedResponse(
+                description=f"I couldn't find any tracks for **{search}**.",
+                colour=values.ERROR_COLOUR,
+            )
+        # links can be playlists, but only the best match for a search should be queued
+        if not search.startswith(("http://", "https://")):
+            tracks = tracks[:1]
+        ingestion = Ingestion(self.bot, guild, tracks, requester_id=ctx.author.id)
+        if (item := await ingestion.start()) is None:
+            raise exceptions.EmbedResponse(
+                description=f"I couldn't find a playable version of any tracks for **{search}**.",
+                colour=values.ERROR_COLOUR,
+            )
+        if not ingestion.done:
+            # the player might have been migrated while the first track was being resolved
+            if (current := ingestion.player) is not None:
+                current.add_ingestion(ingestion)
             raise exceptions.EmbedResponse(
-                description=f"I've reconnected to {author_channel.mention}.",
+                description=f"Adding **{len(tracks)}** tracks to the queue, starting with **{item.title}**.",
                 colour=values.SUCCESS_COLOUR,
             )
-        await author_channel.connect(cls=Player(link=self.bot.lavalink))
         raise exceptions.EmbedResponse(
-            description=f"I've connected to {author_channel.mention}.",
+            description=f"Added **{item.title}** to the queue.",
             colour=values.SUCCESS_COLOUR,
         )
 
-    @commands.command(name="leave", aliases=["disconnect", "dc"])
+    @custom.command(name="skip", aliases=["next"])
     @are_bot_and_user_in_same_voice_channel()
-    async def leave(self, ctx: custom.Context) -> None:
-        """Disconnects the bot from the voice channel."""
+    async def skip(self, ctx: custom.Context) -> None:
+        """Skips the current track."""
         player: Player = ctx.player  # pyright: ignore
-        channel: VoiceChannel = player.channel  # pyright: ignore
-        await player.disconnect()
+        if player.current is None:
+            raise exceptions.EmbedResponse(
+                description="There is nothing playing.",
+                colour=values.ERROR_COLOUR,
+            )
+        skipped = player.current
+        # several skips at once are almost certainly meant as one
+        await self.bot.player_executor.run(player.guild.id, player.skip, key="skip")
         raise exceptions.EmbedResponse(
-            description=f"I've disconnected from {channel.mention}.",
+            description=f"Skipped **{skipped.title}**.",
             colour=values.SUCCESS_COLOUR,
         )
 
-    @commands.command(name="pause")
+    @custom.command(name="queue", aliases=["q"])
     @are_bot_and_user_in_same_voice_channel()
-    async def pause(self, ctx: custom.Context) -> None:
-        """Pauses the current track."""
-        player: Player = ctx.player # pyright: ignore
-        if player.is_paused():
+    async def queue(self, ctx: custom.Context) -> None:
+        """Shows the tracks in the queue."""
+        player: Player = ctx.player  # pyright: ignore
+        if not player.queue:
+            raise exceptions.EmbedResponse(
+                description="The queue is empty.",
+                colour=values.ERROR_COLOUR,
+            )
+        await paginators.TextPaginator(
+            ctx=ctx,
+            items=[
+                f"{index}. {utilities.truncate(item.title, 50)} - {utilities.truncate(item.author, 20)}"
+                for index, item in enumerate(player.queue, start=1)
+            ],
+            items_per_page=10,
+            controller=custom.PaginatorController,
+            header=f"{len(player.queue)} {utilities.plural("track", len(player.queue))}, "
+                   f"{utilities.format_seconds(player.queue.duration // 1000)}\n",
+            codeblock_type=paginators.CodeblockType.BLOCK
+        ).start()
+
+    @custom.command(name="shuffle")
+    @are_bot_and_user_in_same_voice_channel()
+    async def shuffle(self, ctx: custom.Context) -> None:
+        """Shuffles the queue."""
+        player: Player = ctx.player  # pyright: ignore
+        if not player.queue:
             raise exceptions.EmbedResponse(
-                description="The player is already paused.",
+                description="The queue is empty.",
                 colour=values.ERROR_COLOUR,
             )
-        await player.pause()
+        player.queue.shuffle()
         raise exceptions.EmbedResponse(
-            description="The player has been paused.",
+            description="The queue has been shuffled.",
             colour=values.SUCCESS_COLOUR,
         )
 
-    @commands.command(name="resume")
+    @custom.command(name="loop", aliases=["repeat"])
     @are_bot_and_user_in_same_voice_channel()
-    async def resume(self, ctx: custom.Context) -> None:
-        """Resumes the current track."""
-        player: Player = ctx.player # pyright: ignore
-        if not player.is_paused():
+    async def loop(self, ctx: custom.Context, mode: Literal["none", "track", "queue"]) -> None:
+        """Sets the loop mode of the queue."""
+        player: Player = ctx.player  # pyright: ignore
+        player.queue.loop_mode = enums.LoopMode[mode.upper()]
+        raise exceptions.EmbedResponse(
+            description=f"The loop mode is now **{mode}**.",
+            colour=values.SUCCESS_COLOUR,
+        )
+
+    @custom.command(name="move")
+    @are_bot_and_user_in_same_voice_channel()
+    async def move(self, ctx: custom.Context, source: int, destination: int) -> None:
+        """Moves a track to a different position in the queue."""
+        player: Player = ctx.player  # pyright: ignore
+        if not (0 < source <= len(player.queue) and 0 < destination <= len(player.queue)):
             raise exceptions.EmbedResponse(
-                description="The player is not paused.",
+                description=f"The positions should be between **1** and **{len(player.queue)}**.",
                 colour=values.ERROR_COLOUR,
             )
-        await player.resume()
+        item = player.queue.move(source - 1, destination - 1)
         raise exceptions.EmbedResponse(
-            description="The player has been resumed.",
+            description=f"Moved **{item.title}** to position **{destination}**.",
             colour=values.SUCCESS_COLOUR,
         )
 
-    @commands.command(name="play")
-    async def play(self, ctx: custom.Context, *, search: str) -> None:
-        await ctx.player.update(track=(await self.bot.lavalink.search(f"ytsearch:{search}")).tracks[0])  # type: ignore
+    @custom.command(name="remove")
+    @are_bot_and_user_in_same_voice_channel()
+    async def remove(self, ctx: custom.Context, position: int) -> None:
+        """Removes a track from the queue."""
+        player: Player = ctx.player  # pyright: ignore
+        if not 0 < position <= len(player.queue):
+            raise exceptions.EmbedResponse(
+                description=f"The position should be between **1** and **{len(player.queue)}**.",
+                colour=values.ERROR_COLOUR,
+            )
+        item = player.queue.remove(position - 1)
+        raise exceptions.EmbedResponse(
+            description=f"Removed **{item.title}** from the queue.",
+            colour=values.SUCCESS_COLOUR,
+        )
@@ -1,6 +1,11 @@
+import math
+from typing import Literal
+
 from discord.ext import commands
 
-from cd import custom
+from cd import custom, exceptions, values
+from cd.modules.voice.checks import are_bot_and_user_in_same_voice_channel
+from cd.modules.voice.custom import PRESETS, Player
 
 
 __all__ = ["VoiceEffects"]
@@ -10,6 +15,71 @@ class VoiceEffects(custom.Cog, name="Voice Effects"):
     emoji = "💥"
     description = "Add effects and filters to the music."
 
-    @commands.command(name="effect")
-    async def effect(self, ctx: custom.Context) -> None:
-        await ctx.reply("effect")
+    def cog_check(self, ctx: custom.Context) -> Literal[True]:  # pyright: ignore [reportIncompatibleMethodOverride]
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        return True
+
+    @custom.command(name="effect", aliases=["filter"])
+    @are_bot_and_user_in_same_voice_channel()
+    async def effect(self, ctx: custom.Context, name: str) -> None:
+        """Toggles an effect on or off."""
+        player: Player = ctx.player  # pyright: ignore
+        if (name := name.lower()) not in PRESETS:
+            raise exceptions.EmbedResponse(
+                description=f"**{name}** isn't an effect, try one of "
+                            f"{", ".join(f"**{preset}**" for preset in PRESETS)}.",
+                colour=values.ERROR_COLOUR,
+            )
+        enabled = player.effects.toggle(name)
+        raise exceptions.EmbedResponse(
+            description=f"The **{name}** effect has been {"enabled" if enabled else "disabled"}.",
+            colour=values.SUCCESS_COLOUR,
+        )
+
+    @custom.command(name="effects", aliases=["filters"])
+    @are_bot_and_user_in_same_voice_channel()
+    async def effects(self, ctx: custom.Context) -> None:
+        """Shows the effects that are enabled."""
+        player: Player = ctx.player  # pyright: ignore
+        if not player.effects.presets:
+            raise exceptions.EmbedResponse(
+                description="There are no effects enabled.",
+                colour=values.ERROR_COLOUR,
+            )
+        raise exceptions.EmbedResponse(
+            description=f"Enabled effects: {", ".join(f"**{name}**" for name in sorted(player.effects.presets))}.",
+            colour=values.SUCCESS_COLOUR,
+        )
+
+    @custom.command(name="equalizer", aliases=["eq"])
+    @are_bot_and_user_in_same_voice_channel()
+    async def equalizer(self, ctx: custom.Context, band: int, gain: float) -> None:
+        """Sets the gain of one of the 15 equalizer bands, between -0.25 and 1.0."""
+        player: Player = ctx.player  # pyright: ignore
+        if not 0 < band <= 15:
+            raise exceptions.EmbedResponse(
+                description="The band should be between **1** and **15**.",
+                colour=values.ERROR_COLOUR,
+            )
+        if not math.isfinite(gain):
+            raise exceptions.EmbedResponse(
+                description="The gain should be a number between **-0.25** and **1.0**.",
+                colour=values.ERROR_COLOUR,
+            )
+        player.effects.set_band(band - 1, gain)
+        raise exceptions.EmbedResponse(
+            description=f"Band **{band}** is now set to **{player.effects.bands[band - 1]}**.",
+            colour=values.SUCCESS_COLOUR,
+        )
+
+    @custom.command(name="reset-effects", aliases=["reset_effects", "reset-filters", "reset_filters"])
+    @are_bot_and_user_in_same_voice_channel()
+    async def reset_effects(self, ctx: custom.Context) -> None:
+        """Disables every effect and resets the equalizer."""
+        player: Player = ctx.player  # pyright: ignore
+        player.effects.reset()
+        raise exceptions.EmbedResponse(
+            description="All effects have been reset.",
+            colour=values.SUCCESS_COLOUR,
+        )
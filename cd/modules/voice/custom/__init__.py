@@ -1 +1,11 @@
+from .effects import *
+from .executor import *
+from .ingestion import *
+from .now_playing import *
 from .player import *
+from .pool import *
+from .queue import *
+from .reaper import *
+from .search import *
+from .snapshots import *
+from .ticker import *
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import functools
+import logging
+import math
+import time
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from discord.ext import lava
+
+
+if TYPE_CHECKING:
+    from .player import Player
+
+
+__all__ = [
+    "FilterSettings",
+    "PRESETS",
+    "Effects",
+]
+__log__ = logging.getLogger("cd.modules.voice.custom.effects")
+
+# how long there has to be no changes for before sending a filter update to the node, in seconds
+_DEBOUNCE: float = 0.5
+
+_BANDS: int = 15
+_FLAT: tuple[float, ...] = (0.0,) * _BANDS
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class FilterSettings:
+    equalizer: tuple[float, ...] = _FLAT
+    speed: float = 1.0
+    pitch: float = 1.0
+    rate: float = 1.0
+    rotation: float = 0.0
+
+    def merge(self, other: FilterSettings) -> FilterSettings:
+        # gains add up, timescales compound, and the fastest rotation wins
+        return FilterSettings(
+            equalizer=tuple(min(max(a + b, -0.25), 1.0) for a, b in zip(self.equalizer, other.equalizer)),
+            speed=self.speed * other.speed,
+            pitch=self.pitch * other.pitch,
+            rate=self.rate * other.rate,
+            rotation=max(self.rotation, other.rotation),
+        )
+
+
+def _gains(*gains: float) -> tuple[float, ...]:
+    return (*gains, *(0.0 for _ in range(_BANDS - len(gains))))
+
+
+PRESETS: dict[str, FilterSettings] = {
+    "bass-boost":   FilterSettings(equalizer=_gains(0.2, 0.15, 0.1, 0.05, 0.0, -0.05)),
+    "treble-boost": FilterSettings(equalizer=(*_FLAT[:9], 0.05, 0.1, 0.15, 0.2, 0.2, 0.2)),
+    "soft":         FilterSettings(equalizer=(*_FLAT[:8], *(-0.25 for _ in range(7)))),
+    "nightcore":    FilterSettings(speed=1.2, pitch=1.2),
+    "vaporwave":    FilterSettings(speed=0.85, pitch=0.8),
+    "8d":           FilterSettings(rotation=0.2),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _build_filter(presets: frozenset[str], bands: tuple[float, ...]) -> lava.Filter:
+    # built once per combination and then shared between players, so they must never be modified. the cache is
+    # bounded because band gains are typed in freely, so the number of combinations isn't
+    settings = functools.reduce(
+        FilterSettings.merge,
+        (PRESETS[name] for name in sorted(presets)),
+        FilterSettings(equalizer=bands),
+    )
+    return lava.Filter(
+        equalizer=lava.Equalizer(bands=list(enumerate(settings.equalizer)))
+        if settings.equalizer != _FLAT else None,
+        timescale=lava.Timescale(speed=settings.speed, pitch=settings.pitch, rate=settings.rate)
+        if (settings.speed, settings.pitch, settings.rate) != (1.0, 1.0, 1.0) else None,
+        rotation=lava.Rotation(speed=settings.rotation)
+        if settings.rotation else None,
+    )
+
+
+class Effects:
+    """Tracks the effects enabled on a player, and sends them to its node as a single merged filter.
+
+    Changes are debounced, so a burst of them results in one filter update rather than one per change.
+    """
+
+    def __init__(self, player: Player) -> None:
+        self._player: Player = player
+        self.presets: frozenset[str] = frozenset()
+        self.bands: tuple[float, ...] = _FLAT
+        self._task: asyncio.Task[None] | None = None
+        self._dirty: bool = False
+        self._changed_at: float = 0.0
+        # stats
+        self.changes: int = 0
+        self.updates: int = 0
+
+    def __repr__(self) -> str:
+        return f"<Effects: presets={sorted(self.presets)}, changes={self.changes}, updates={self.updates}>"
+
+    @property
+    def filter(self) -> lava.Filter:
+        return _build_filter(self.presets, self.bands)
+
+    async def _run(self) -> None:
+        while self._dirty:
+            # every change restarts the wait, so a long burst of them still only sends one update
+            while (remaining := self._changed_at + _DEBOUNCE - time.monotonic()) > 0:
+                await asyncio.sleep(remaining)
+            self._dirty = False
+            try:
+                await self._player.update(filter=self.filter)
+            except Exception as error:
+                __log__.error(f"Error while updating filters in guild {self._player.guild.id}.", exc_info=error)
+            else:
+                self.updates += 1
+
+    def _schedule(self) -> None:
+        self.changes += 1
+        self._dirty = True
+        self._changed_at = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def load(self, presets: Iterable[str], bands: Iterable[float]) -> None:
+        # used when restoring a player, where the filter is sent along with everything else
+        self.presets = frozenset(name for name in presets if name in PRESETS)
+        self.bands = tuple(bands)
+
+    def toggle(self, name: str) -> bool:
+        enabled = name not in self.presets
+        self.presets = self.presets | {name} if enabled else self.presets - {name}
+        self._schedule()
+        return enabled
+
+    def set_band(self, band: int, gain: float) -> None:
+        # nan and infinity get through min() and max(), so they have to be rejected separately
+        if not math.isfinite(gain):
+            raise ValueError(f"Gain must be a finite number, not {gain}.")
+        self.bands = (*self.bands[:band], min(max(gain, -0.25), 1.0), *self.bands[band + 1:])
+        self._schedule()
+
+    def reset(self) -> None:
+        self.presets = frozenset()
+        self.bands = _FLAT
+        self._schedule()
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import dataclasses
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+__all__ = ["PlayerExecutor"]
+__log__ = logging.getLogger("cd.modules.voice.custom.executor")
+
+
+@dataclasses.dataclass(slots=True)
+class _Operation:
+    key: Hashable | None
+    function: Callable[[], Awaitable[Any]]
+    future: asyncio.Future[Any]
+
+
+@dataclasses.dataclass(slots=True)
+class _GuildQueue:
+    operations: collections.deque[_Operation]
+    task: asyncio.Task[None] | None = None
+
+
+class PlayerExecutor:
+    """Runs player operations one at a time and in order for each guild, without any locking between guilds.
+
+    Each guild only has a queue while it has operations waiting or running, so the number of queues is bounded by
+    the number of guilds that are busy at once. An operation with the same key as the one queued right before it is
+    redundant, so it isn't queued and its caller gets the earlier operation's result instead.
+    """
+
+    def __init__(self) -> None:
+        self._queues: dict[int, _GuildQueue] = {}
+        # stats
+        self.executed: int = 0
+        self.collapsed: int = 0
+
+    def __repr__(self) -> str:
+        return f"<PlayerExecutor: busy={len(self._queues)}, executed={self.executed}, collapsed={self.collapsed}>"
+
+    @property
+    def busy(self) -> int:
+        return len(self._queues)
+
+    async def _work(self, guild_id: int, queue: _GuildQueue) -> None:
+        operation: _Operation | None = None
+        try:
+            while queue.operations:
+                operation = queue.operations.popleft()
+                try:
+                    result = await operation.function()
+                except Exception as error:
+                    operation.future.set_exception(error)
+                else:
+                    operation.future.set_result(result)
+                self.executed += 1
+        finally:
+            del self._queues[guild_id]
+            # if the worker was cancelled, e.g. during shutdown, nothing is going to run the operations it had left,
+            # so cancel them rather than leaving their callers waiting forever
+            for pending in (operation, *queue.operations):
+                if pending is not None and not pending.future.done():
+                    pending.future.cancel()
+            queue.operations.clear()
+
+    async def run[T](
+        self,
+        guild_id: int,
+        function: Callable[[], Awaitable[T]],
+        /, *,
+        key: Hashable | None = None,
+    ) -> T:
+        queue = self._queues.get(guild_id)
+        if queue is not None and key is not None and queue.operations and queue.operations[-1].key == key:
+            self.collapsed += 1
+            return await asyncio.shield(queue.operations[-1].future)
+        operation = _Operation(key, function, asyncio.get_running_loop().create_future())
+        if queue is None:
+            queue = self._queues[guild_id] = _GuildQueue(collections.deque([operation]))
+            queue.task = asyncio.create_task(self._work(guild_id, queue))
+        else:
+            queue.operations.append(operation)
+        # shielded so that a cancelled caller doesn't cancel the operation for anyone else waiting on it
+        return await asyncio.shield(operation.future)
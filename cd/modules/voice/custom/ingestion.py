@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+import discord
+from discord.ext import lava
+
+from cd.config import CONFIG
+
+from .player import Player
+from .queue import QueueItem
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["Ingestion"]
+__log__ = logging.getLogger("cd.modules.voice.custom.ingestion")
+
+
+class Ingestion:
+    """Adds the tracks of a playlist to a guild's queue, starting playback as soon as the first one is resolved
+    and resolving the rest in the background, in bounded-concurrency batches."""
+
+    def __init__(
+        self,
+        bot: CD,
+        guild: discord.Guild,
+        tracks: Sequence[lava.Track],
+        /, *,
+        requester_id: int,
+    ) -> None:
+        self._bot: CD = bot
+        self._guild: discord.Guild = guild
+        self._tracks: Sequence[lava.Track] = tracks
+        self._requester_id: int = requester_id
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(CONFIG.voice.ingestion_concurrency)
+        self._task: asyncio.Task[None] | None = None
+        # stats
+        self.resolved: int = 0
+        self.failed: int = 0
+
+    def __repr__(self) -> str:
+        return f"<Ingestion: guild_id={self._guild.id}, tracks={len(self._tracks)}, resolved={self.resolved}, " \
+               f"failed={self.failed}>"
+
+    @property
+    def player(self) -> Player | None:
+        # looked up every time, because the player is replaced if it's migrated to another node
+        player = self._guild.voice_client
+        return player if isinstance(player, Player) else None
+
+    @property
+    def done(self) -> bool:
+        return self._task is None or self._task.done()
+
+    async def _resolve(self, track: lava.Track) -> QueueItem | None:
+        if track.source != "spotify":
+            self.resolved += 1
+            return QueueItem.from_track(track, requester_id=self._requester_id)
+        # spotify tracks have no audio of their own, so find the same track on youtube music
+        async with self._semaphore:
+            try:
+                results = await self._bot.search_cache.search(f"{track.author} - {track.title}", source="ytmsearch")
+            except Exception as error:
+                __log__.warning(f"Couldn't resolve '{track.title}' by '{track.author}': {error}")
+                results = []
+        if not results:
+            self.failed += 1
+            return None
+        self.resolved += 1
+        return QueueItem.from_track(results[0], requester_id=self._requester_id)
+
+    async def _play_if_idle(self, player: Player) -> None:
+        # several plays landing at once only need to start playback once
+        await self._bot.player_executor.run(self._guild.id, player.play_if_idle, key="play")
+
+    async def start(self) -> QueueItem | None:
+        # resolve tracks one at a time until one works, so that playback can start after a single search
+        for index, track in enumerate(self._tracks):
+            if (item := await self._resolve(track)) is not None:
+                break
+        else:
+            return None
+        if (player := self.player) is None:
+            return None
+        player.queue.put(item)
+        await self._play_if_idle(player)
+        if index + 1 < len(self._tracks):
+            self._task = asyncio.create_task(self._ingest(self._tracks[index + 1:]))
+        return item
+
+    async def _ingest(self, tracks: Sequence[lava.Track]) -> None:
+        size = CONFIG.voice.ingestion_batch_size
+        for start in range(0, len(tracks), size):
+            # batches are added in one go, so that the playlist's order is kept
+            items = await asyncio.gather(*(self._resolve(track) for track in tracks[start:start + size]))
+            if (player := self.player) is None:
+                return
+            player.queue.extend(item for item in items if item is not None)
+            # the queue may have run dry while this batch was being resolved
+            await self._play_if_idle(player)
+        __log__.debug(f"Finished ingesting {len(self._tracks)} tracks in guild {self._guild.id}.")
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import discord
+
+from cd import utilities, values
+
+
+if TYPE_CHECKING:
+    from .player import Player
+
+
+__all__ = ["NowPlaying"]
+__log__ = logging.getLogger("cd.modules.voice.custom.now_playing")
+
+# how long to wait for more track transitions before updating the message, in seconds
+_DEBOUNCE: float = 2.0
+_PROGRESS_BAR_LENGTH: int = 20
+
+
+def _format_time(milliseconds: int) -> str:
+    minutes, seconds = divmod(milliseconds // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+class NowPlaying:
+    """Keeps a single now-playing message per player up to date, editing it in place rather than sending new ones.
+
+    Updates are debounced, and the message is always rendered from the player's state at the time of the edit, so
+    any updates that were superseded while waiting are dropped.
+    """
+
+    def __init__(self, player: Player) -> None:
+        self._player: Player = player
+        self.channel: discord.abc.Messageable | None = None
+        self.message: discord.Message | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._dirty: bool = False
+        self._embed: discord.Embed | None = None
+        self._lock: asyncio.Lock = asyncio.Lock()
+        # stats
+        self.requested: int = 0
+        self.sent: int = 0
+
+    def __repr__(self) -> str:
+        return f"<NowPlaying: requested={self.requested}, sent={self.sent}>"
+
+    def _build_embed(self) -> discord.Embed:
+        if (item := self._player.current) is None:
+            return utilities.embed(
+                colour=values.THEME_COLOUR,
+                description="Nothing is playing.",
+            )
+        # the position is rounded down to whole seconds, so that edits only happen when something visible changes
+        position = min(int(self._player.position) // 1000 * 1000, item.length)
+        filled = position * _PROGRESS_BAR_LENGTH // item.length if item.length else 0
+        return utilities.embed(
+            colour=values.THEME_COLOUR,
+            title="Now playing",
+            description=f"**{discord.utils.escape_markdown(item.title)}** by "
+                        f"**{discord.utils.escape_markdown(item.author)}**\n"
+                        f"`{"▬" * filled}🔘{"▬" * (_PROGRESS_BAR_LENGTH - filled)}` "
+                        f"{_format_time(position)} / {_format_time(item.length)}",
+            footer=f"{len(self._player.queue)} {utilities.plural("track", len(self._player.queue))} queued",
+        )
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            embed = self._build_embed()
+            # nothing would change, so don't spend an edit on it
+            if self.message is not None and self._embed is not None and embed.to_dict() == self._embed.to_dict():
+                return False
+            if (channel := self.channel or self._player._channel) is None:
+                return False
+            if self.message is not None:
+                try:
+                    await self.message.edit(embed=embed)
+                except discord.NotFound:
+                    self.message = None
+            if self.message is None:
+                self.message = await channel.send(embed=embed)
+                self._player.client.progress_ticker.register(self._player.guild.id)
+            self._embed = embed
+            self.sent += 1
+            return True
+
+    async def _run(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(_DEBOUNCE)
+            self._dirty = False
+            try:
+                await self.flush()
+            except discord.HTTPException as error:
+                __log__.warning(f"Couldn't update the now-playing message in guild {self._player.guild.id}: {error}")
+
+    def update(self) -> None:
+        self.requested += 1
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
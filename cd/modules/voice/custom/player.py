@@ -1,16 +1,201 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import TYPE_CHECKING, Any
 
 from discord.ext import lava
+from discord.utils import MISSING
+
+from cd import enums, utilities
+
+from .effects import Effects
+from .now_playing import NowPlaying
+from .queue import Queue, QueueItem
 
 
 if TYPE_CHECKING:
     from cd.bot import CD  # type: ignore
 
+    from .ingestion import Ingestion
+
+
+__all__ = [
+    "PlayerState",
+    "Player",
+]
+__log__ = logging.getLogger("cd.modules.voice.custom.player")
+
+# how long before the end of a track the next one should be resolved, in milliseconds
+_PREFETCH_WINDOW: int = 10_000
+
+
+@dataclasses.dataclass(slots=True)
+class PlayerState:
+    channel_id: int
+    track: lava.Track | None
+    position: int
+    paused: bool
+    volume: int
+    presets: frozenset[str]
+    bands: tuple[float, ...]
+    queue: Queue
+    current: QueueItem | None
 
-__all__ = ["Player"]
-    
 
 class Player(lava.Player["CD"]):
-    pass
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.queue: Queue = Queue()
+        self.current: QueueItem | None = None
+        self.now_playing: NowPlaying = NowPlaying(self)
+        self.effects: Effects = Effects(self)
+        self._prefetched: tuple[QueueItem, lava.Track] | None = None
+        self._prefetch_task: asyncio.Task[None] | None = None
+        self._ended_at: float | None = None
+        # playlists that are still being added to the queue in the background
+        self.ingestions: list[Ingestion] = []
+        # stats
+        self.gap_stats: utilities.Histogram = utilities.Histogram()
+        self.prefetch_hits: int = 0
+        self.prefetch_misses: int = 0
+
+    def add_ingestion(self, ingestion: Ingestion) -> None:
+        self.ingestions = [*(ingestion for ingestion in self.ingestions if not ingestion.done), ingestion]
+
+    def cancel_ingestions(self) -> None:
+        for ingestion in self.ingestions:
+            ingestion.cancel()
+        self.ingestions.clear()
+
+    def cleanup(self) -> None:
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+        self.now_playing.cancel()
+        self.effects.cancel()
+        super().cleanup()
+
+    async def _resolve(self, item: QueueItem) -> tuple[QueueItem, lava.Track] | None:
+        # decoding only parses the encoded track, so load its uri again to check that it can still be played
+        search_cache = self.client.search_cache
+        try:
+            if item.uri and (tracks := await search_cache.search(item.uri)):
+                # replace the queued item if lavalink has given back a newer version of it
+                if tracks[0].encoded != item.encoded:
+                    return QueueItem.from_track(tracks[0], requester_id=item.requester_id), tracks[0]
+                return item, tracks[0]
+        except Exception as error:
+            __log__.debug(f"Couldn't load '{item.title}' in guild {self.guild.id}, searching again: {error}")
+        # the track is gone or never had a uri, so look for another copy of it
+        try:
+            tracks = await search_cache.search(f"{item.author} - {item.title}", source="ytmsearch")
+        except Exception as error:
+            __log__.warning(f"Couldn't refresh '{item.title}' in guild {self.guild.id}: {error}")
+            return None
+        if not tracks:
+            return None
+        return QueueItem.from_track(tracks[0], requester_id=item.requester_id), tracks[0]
+
+    async def _prefetch(self) -> None:
+        if (track := self.track) is None:
+            return
+        # wait until the current track is close to ending, keeping up with any pauses or seeks along the way
+        while (remaining := track.length - self.position) > _PREFETCH_WINDOW:
+            await asyncio.sleep((remaining - _PREFETCH_WINDOW) / 1000)
+        if (item := self.queue.peek(self.current)) is None or item is self.current:
+            return
+        if (resolved := await self._resolve(item)) is None:
+            return
+        # swap refreshed items into the queue, as long as it hasn't changed in the meantime
+        if resolved[0] is not item and self.queue and self.queue[0] is item:
+            self.queue[0] = resolved[0]
+        self._prefetched = resolved
+
+    def schedule_prefetch(self) -> None:
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+        self._prefetched = None
+        self._prefetch_task = asyncio.create_task(self._prefetch())
+
+    async def play_next(self) -> QueueItem | None:
+        previous, track = self.current, self.track
+        prefetched, self._prefetched = self._prefetched, None
+        while (item := self.queue.next(self.current)) is not None:
+            if prefetched is not None and prefetched[0] is item:
+                self.prefetch_hits += 1
+                resolved = prefetched
+            elif item is previous and track is not None:
+                # looping the current track, which is already decoded
+                resolved = item, track
+            else:
+                self.prefetch_misses += 1
+                resolved = await self._resolve(item)
+            if resolved is not None:
+                break
+            # skip items that can't be played anymore
+            __log__.warning(f"Skipping unplayable track '{item.title}' in guild {self.guild.id}.")
+            self.current = None
+        else:
+            self.current = None
+            return None
+        self.current, track = resolved
+        await self.update(track=track)
+        return self.current
+
+    async def play_if_idle(self) -> None:
+        if self.current is None:
+            await self.play_next()
+
+    async def skip(self) -> QueueItem | None:
+        # skipping a looping track should move on from it, rather than start it again
+        if self.current is not None and self.queue.loop_mode is enums.LoopMode.TRACK:
+            self.queue.history.append(self.current)
+            self.current = None
+        if (item := await self.play_next()) is None:
+            # nothing replaced the skipped track, so it has to be stopped, otherwise it carries on playing while the
+            # player looks idle
+            await self.stop()
+        return item
+
+    async def handle_track_end(self, *, failed: bool = False) -> None:
+        self._ended_at = time.perf_counter()
+        # a track that failed to load would only fail again if it were looped or put back into the queue
+        if failed and self.current is not None:
+            __log__.warning(f"Dropping track '{self.current.title}' in guild {self.guild.id}, it failed to load.")
+            self.current = None
+        await self.play_next()
+
+    def handle_track_start(self) -> None:
+        # the gap is the time between lavalink finishing one track and starting the next
+        if self._ended_at is not None:
+            self.gap_stats.record((time.perf_counter() - self._ended_at) * 1000)
+            self._ended_at = None
+        self.schedule_prefetch()
+
+    def snapshot(self) -> PlayerState:
+        return PlayerState(
+            channel_id=self.channel.id,  # pyright: ignore
+            track=self.track,
+            position=int(self.position),
+            paused=self.is_paused(),
+            volume=self.volume,
+            presets=self.effects.presets,
+            bands=self.effects.bands,
+            queue=self.queue,
+            current=self.current,
+        )
+
+    async def restore(self, state: PlayerState) -> None:
+        self.queue = state.queue
+        self.current = state.current
+        self.effects.load(state.presets, state.bands)
+        await self.update(
+            track=state.track or MISSING,
+            position=state.position if state.track else MISSING,
+            paused=state.paused,
+            volume=state.volume,
+            filter=self.effects.filter,
+        )
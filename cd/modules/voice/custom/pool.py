@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+from discord.ext import lava, tasks
+
+from cd.config import CONFIG, DiscordExtLavaLink
+
+from .player import Player
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = [
+    "Node",
+    "NodePool",
+]
+__log__ = logging.getLogger("cd.modules.voice.custom.pool")
+
+# a node that stops responding without closing the connection shouldn't hold up failure detection
+_STATS_TIMEOUT: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=5)
+
+
+class Node:
+
+    def __init__(self, bot: CD, config: DiscordExtLavaLink) -> None:
+        self._bot: CD = bot
+        self._config: DiscordExtLavaLink = config
+        self.identifier: str = config.identifier or f"{config.host}:{config.port}"
+        self.region: str | None = config.region
+        self.link: lava.Link[Player] = lava.Link(
+            host=config.host,
+            port=config.port,
+            password=config.password,
+            user_id=bot.user.id,  # pyright: ignore
+            spotify_client_id=CONFIG.connections.spotify.client_id,
+            spotify_client_secret=CONFIG.connections.spotify.client_secret,
+        )
+        self.available: bool = False
+        self.draining: bool = False
+        self.stats: dict[str, Any] | None = None
+        # the session that this node's players were created on, lavalink forgets them if it changes
+        self.session_id: str | None = None
+
+    def __repr__(self) -> str:
+        return f"<Node: identifier='{self.identifier}', available={self.available}, draining={self.draining}, " \
+               f"players={len(self.players)}>"
+
+    @property
+    def connected(self) -> bool:
+        websocket = self.link._websocket
+        return websocket is not None and not websocket.closed and self.link._session_id is not None
+
+    @property
+    def players(self) -> list[Player]:
+        # tracked locally so that players created since the last stats update are taken into account
+        return [
+            player for player in self._bot.voice_clients
+            if isinstance(player, Player) and player.link is self.link
+        ]
+
+    @property
+    def penalty(self) -> float:
+        # based on the penalty calculation used by the official lavalink clients
+        penalty = float(len(self.players))
+        if self.stats is None:
+            return penalty
+        penalty += 1.05 ** (100 * self.stats["cpu"]["systemLoad"]) * 10 - 10
+        if (frame_stats := self.stats.get("frameStats")) is not None:
+            penalty += 1.03 ** (500 * (frame_stats["deficit"] / 3000)) * 600 - 600
+            penalty += (1.03 ** (500 * (frame_stats["nulled"] / 3000)) * 300 - 300) * 2
+        return penalty
+
+    async def connect(self) -> None:
+        try:
+            __log__.debug(f"Attempting lavalink connection to node '{self.identifier}'.")
+            await self.link.connect()
+        except Exception as error:
+            self.available = False
+            __log__.error(f"Error while connecting to lavalink node '{self.identifier}'.", exc_info=error)
+        else:
+            self.available = True
+            self.session_id = self.link._session_id
+            __log__.info(f"Successfully connected to lavalink node '{self.identifier}'.")
+
+    async def update_stats(self) -> None:
+        # only used for load balancing, whether the node is available depends on its websocket
+        try:
+            async with self._bot.session.get(
+                f"http://{self._config.host}:{self._config.port}/v4/stats",
+                headers={"Authorization": self._config.password},
+                timeout=_STATS_TIMEOUT,
+            ) as response:
+                response.raise_for_status()
+                self.stats = await response.json()
+        except Exception as error:
+            self.stats = None
+            __log__.warning(f"Couldn't get stats for lavalink node '{self.identifier}': {error}")
+
+
+class NodePool:
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self.nodes: dict[str, Node] = {}
+
+    def __repr__(self) -> str:
+        return f"<NodePool: nodes={list(self.nodes.values())}>"
+
+    async def _check(self, node: Node) -> None:
+        await node.update_stats()
+        if node.connected and node.link._session_id == node.session_id:
+            return
+        # the websocket has dropped, or the node restarted between checks and came back with a new session, either
+        # way the players it had don't exist on it anymore
+        if node.available:
+            __log__.warning(f"Lavalink node '{node.identifier}' lost its session, migrating its players.")
+        node.available = False
+        if node.connected:
+            node.available = True
+            node.session_id = node.link._session_id
+        else:
+            await node.connect()
+        # the players are moved to another node, or recreated on this one if it's the only one left
+        if node.players:
+            await self.evacuate(node)
+
+    @tasks.loop(seconds=10.0)
+    async def _loop(self) -> None:
+        # checked at the same time so that one slow node doesn't delay noticing that another has gone down
+        results = await asyncio.gather(*(self._check(node) for node in self.nodes.values()), return_exceptions=True)
+        for node, result in zip(self.nodes.values(), results):
+            if isinstance(result, Exception):
+                __log__.error(f"Error while checking lavalink node '{node.identifier}'.", exc_info=result)
+
+    async def connect(self) -> None:
+        for config in CONFIG.discord.ext.lava.links:
+            node = Node(self._bot, config)
+            self.nodes[node.identifier] = node
+            await node.connect()
+        if not any(node.available for node in self.nodes.values()):
+            __log__.critical("Error while connecting to lavalink, no nodes are available.")
+            raise RuntimeError("No lavalink nodes are available.")
+        self._loop.start()
+
+    def select(self, *, region: str | None = None) -> Node | None:
+        nodes = [node for node in self.nodes.values() if node.available and not node.draining]
+        # prefer nodes in the same region as the voice channel if there are any. only channels with a region
+        # override have one, automatic channels have an rtc_region of None and the voice server discord picks for
+        # them isn't known until after a node has been chosen, so they can go to any node.
+        if CONFIG.discord.ext.lava.region_affinity and region is not None:
+            nodes = [node for node in nodes if node.region == region] or nodes
+        return min(nodes, key=lambda node: node.penalty, default=None)
+
+    def get_node(self, player: Player) -> Node | None:
+        return next((node for node in self.nodes.values() if node.link is player.link), None)
+
+    def _select_or_raise(self) -> Node:
+        if (node := self.select()) is None:
+            raise RuntimeError("No lavalink nodes are available.")
+        return node
+
+    async def search(self, query: str) -> lava.Result:
+        return await self._select_or_raise().link.search(query)
+
+    async def decode_tracks(self, encoded: list[str]) -> list[lava.Track]:
+        return await self._select_or_raise().link.decode_tracks(encoded)
+
+    async def migrate(self, player: Player, node: Node) -> Player:
+        state = player.snapshot()
+        channel = player.channel
+        guild = player.guild
+        try:
+            await player.disconnect()
+        except Exception:
+            # the old node is probably unreachable, so just leave the voice channel and clean up locally
+            await guild.change_voice_state(channel=None)
+            player.cleanup()
+        # reconnect to the voice channel on the new node and carry on from where the old one left off
+        new_player: Player = await channel.connect(cls=Player(link=node.link))  # pyright: ignore
+        # keep editing the same now-playing message
+        new_player.now_playing.channel = player.now_playing.channel
+        new_player.now_playing.message = player.now_playing.message
+        # playlists that were being added carry on into the new player's queue
+        new_player.ingestions = player.ingestions
+        await new_player.restore(state)
+        return new_player
+
+    async def evacuate(self, node: Node) -> int:
+        # each player waits for a full voice handshake, so move several at once rather than one after another
+        semaphore = asyncio.Semaphore(CONFIG.voice.migration_concurrency)
+
+        async def evacuate(player: Player) -> bool:
+            async with semaphore:
+                try:
+                    if (target := self.select(region=player.channel.rtc_region)) is None:  # pyright: ignore
+                        __log__.error(
+                            f"Couldn't migrate player in guild {player.guild.id}, no other nodes are available."
+                        )
+                        return False
+                    await self.migrate(player, target)
+                except Exception as error:
+                    __log__.error(f"Error while migrating player in guild {player.guild.id}.", exc_info=error)
+                    return False
+                return True
+
+        results = await asyncio.gather(*(evacuate(player) for player in node.players))
+        __log__.info(f"Migrated {sum(results)} players away from lavalink node '{node.identifier}'.")
+        return sum(results)
+
+    async def drain(self, node: Node) -> int:
+        node.draining = True
+        return await self.evacuate(node)
+
+    def undrain(self, node: Node) -> None:
+        node.draining = False
+
+    def stop(self) -> None:
+        # cancelled rather than stopped, so that a check in progress can't start migrating players during shutdown
+        self._loop.cancel()
+
+    async def close(self) -> None:
+        self.stop()
+        for node in self.nodes.values():
+            await node.link._reset_state()
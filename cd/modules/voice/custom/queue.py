@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import base64
+import collections
+import dataclasses
+import random
+import struct
+from collections.abc import Iterable, Iterator
+
+from discord.ext import lava
+
+from cd import enums
+
+
+__all__ = [
+    "QueueItem",
+    "Queue",
+]
+
+_CHUNK_SIZE: int = 256
+_HISTORY_SIZE: int = 50
+
+_TRACK_INFO_VERSIONED: int = 1
+
+
+class _TrackInfoReader:
+    """Reads the fields out of a lavaplayer encoded track, which are stored as java DataOutput primitives."""
+
+    __slots__ = ("_data", "_offset", "version")
+
+    def __init__(self, data: bytes) -> None:
+        self._data: bytes = data
+        self._offset: int = 0
+        header: int = self._read("!I")
+        self.version: int = self._read("!B") if header >> 30 & _TRACK_INFO_VERSIONED else 1
+
+    def _read(self, fmt: str) -> int:
+        value, = struct.unpack_from(fmt, self._data, self._offset)
+        self._offset += struct.calcsize(fmt)
+        return value
+
+    def read_utf(self) -> str:
+        length = self._read("!H")
+        raw = self._data[self._offset:self._offset + length]
+        self._offset += length
+        # java's modified utf-8 encodes characters outside the bmp as surrogate pairs
+        return raw.decode("utf-8", "surrogatepass").encode("utf-16", "surrogatepass").decode("utf-16")
+
+    def read_long(self) -> int:
+        return self._read("!q")
+
+    def read_bool(self) -> bool:
+        return bool(self._read("!?"))
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class QueueItem:
+    # the decoded form of the encoded track string is ~25% smaller, and everything else is read out of it on demand
+    data: bytes
+    length: int
+    requester_id: int
+
+    @classmethod
+    def from_track(cls, track: lava.Track, /, *, requester_id: int) -> QueueItem:
+        return cls(data=base64.b64decode(track.encoded), length=track.length, requester_id=requester_id)
+
+    @property
+    def encoded(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+    @property
+    def title(self) -> str:
+        return _TrackInfoReader(self.data).read_utf()
+
+    @property
+    def author(self) -> str:
+        reader = _TrackInfoReader(self.data)
+        reader.read_utf()
+        return reader.read_utf()
+
+    @property
+    def uri(self) -> str | None:
+        reader = _TrackInfoReader(self.data)
+        reader.read_utf()
+        reader.read_utf()
+        reader.read_long()
+        reader.read_utf()
+        reader.read_bool()
+        return reader.read_utf() if reader.version >= 2 and reader.read_bool() else None
+
+
+class _Fenwick:
+    """A binary indexed tree of chunk sizes, used to find which chunk an index falls into."""
+
+    __slots__ = ("_tree",)
+
+    def __init__(self, values: Iterable[int] = ()) -> None:
+        self._tree: list[int] = [0]
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def append(self, value: int) -> None:
+        index = len(self._tree)
+        # each node holds the sum of the range ending at it, which is the new value plus the nodes it covers
+        self._tree.append(value + self.prefix(index - 1) - self.prefix(index - (index & -index)))
+
+    def add(self, index: int, delta: int) -> None:
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        # the sum of the first 'index' values
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def search(self, target: int) -> int:
+        # the position of the first value whose prefix sum exceeds 'target'
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            if position + step < len(self._tree) and self._tree[position + step] <= target:
+                position += step
+                target -= self._tree[position]
+            step >>= 1
+        return position
+
+
+class Queue:
+    """A track queue stored as chunks of deques, indexed by a fenwick tree of chunk sizes.
+
+    Enqueueing and dequeueing are amortised O(1), indexing, insertion and removal are O(log n) plus a bounded
+    amount of work inside a single chunk.
+    """
+
+    __slots__ = ("_chunks", "_tree", "_head", "_consumed", "_length", "revision", "loop_mode", "history")
+
+    def __init__(self, items: Iterable[QueueItem] = ()) -> None:
+        # every chunk except the last is 'sealed' and has its size in the tree, chunks before '_head' are empty and
+        # only kept until the next rebuild, and '_consumed' items have been popped from the head chunk since its size
+        # was last written to the tree.
+        self._chunks: list[collections.deque[QueueItem]] = []
+        self._tree: _Fenwick = _Fenwick()
+        self._head: int = 0
+        self._consumed: int = 0
+        self._length: int = 0
+        self._rebuild(items)
+        # incremented whenever the items change, so that unchanged queues don't have to be saved again
+        self.revision: int = 0
+        self.loop_mode: enums.LoopMode = enums.LoopMode.NONE
+        self.history: collections.deque[QueueItem] = collections.deque(maxlen=_HISTORY_SIZE)
+
+    def __repr__(self) -> str:
+        return f"<Queue: length={self._length}, loop_mode={self.loop_mode}>"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __iter__(self) -> Iterator[QueueItem]:
+        for chunk in self._chunks[self._head:]:
+            yield from chunk
+
+    def __getitem__(self, index: int) -> QueueItem:
+        position, offset = self._locate(self._normalise(index))
+        return self._chunks[position][offset]
+
+    def __setitem__(self, index: int, item: QueueItem) -> None:
+        position, offset = self._locate(self._normalise(index))
+        self._chunks[position][offset] = item
+        self.revision += 1
+
+    # internal
+
+    def _normalise(self, index: int) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _rebuild(self, items: Iterable[QueueItem]) -> None:
+        items = list(items)
+        self._chunks = [
+            collections.deque(items[start:start + _CHUNK_SIZE])
+            for start in range(0, len(items), _CHUNK_SIZE)
+        ]
+        if not self._chunks or len(self._chunks[-1]) >= _CHUNK_SIZE:
+            self._chunks.append(collections.deque())
+        self._tree = _Fenwick(len(chunk) for chunk in self._chunks[:-1])
+        self._head = 0
+        self._consumed = 0
+        self._length = len(items)
+
+    def _is_sealed(self, position: int) -> bool:
+        return position < len(self._chunks) - 1
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        # translate the index into the tree's coordinates, which still count items popped from the head chunk
+        target = index + self._tree.prefix(self._head) + self._consumed
+        if target >= self._tree.prefix(len(self._tree)):
+            return len(self._chunks) - 1, target - self._tree.prefix(len(self._tree))
+        position = self._tree.search(target)
+        offset = target - self._tree.prefix(position)
+        return position, offset - self._consumed if position == self._head else offset
+
+    def _advance_head(self) -> None:
+        # skip past chunks that have been emptied, so that the head chunk always holds the first item
+        while self._is_sealed(self._head) and not self._chunks[self._head]:
+            self._head += 1
+            self._consumed = 0
+        if self._head > 16 and self._head * 2 > len(self._chunks):
+            self._rebuild(self)
+
+    # public
+
+    def put(self, item: QueueItem) -> None:
+        tail = self._chunks[-1]
+        tail.append(item)
+        self._length += 1
+        self.revision += 1
+        if len(tail) >= _CHUNK_SIZE:
+            # seal the tail chunk, this happens once every '_CHUNK_SIZE' puts
+            self._tree.append(len(tail))
+            self._chunks.append(collections.deque())
+
+    def extend(self, items: Iterable[QueueItem]) -> None:
+        for item in items:
+            self.put(item)
+
+    def put_first(self, item: QueueItem) -> None:
+        self._chunks[self._head].appendleft(item)
+        self._length += 1
+        self.revision += 1
+        if not self._is_sealed(self._head):
+            return
+        if self._consumed:
+            self._consumed -= 1
+        else:
+            self._tree.add(self._head, 1)
+
+    def get(self) -> QueueItem | None:
+        if not self._length:
+            return None
+        item = self._chunks[self._head].popleft()
+        self._length -= 1
+        self.revision += 1
+        if self._is_sealed(self._head):
+            self._consumed += 1
+            self._advance_head()
+        return item
+
+    def insert(self, index: int, item: QueueItem) -> None:
+        if index >= self._length:
+            self.put(item)
+            return
+        if index <= 0:
+            self.put_first(item)
+            return
+        position, offset = self._locate(index)
+        chunk = self._chunks[position]
+        chunk.insert(offset, item)
+        self._length += 1
+        self.revision += 1
+        if not self._is_sealed(position):
+            return
+        self._tree.add(position, 1)
+        # split chunks that have grown too large from repeated insertions
+        if len(chunk) > _CHUNK_SIZE * 2:
+            self._rebuild(self)
+
+    def remove(self, index: int) -> QueueItem:
+        position, offset = self._locate(self._normalise(index))
+        chunk = self._chunks[position]
+        item = chunk[offset]
+        del chunk[offset]
+        self._length -= 1
+        self.revision += 1
+        if self._is_sealed(position):
+            self._tree.add(position, -1)
+            self._advance_head()
+        return item
+
+    def move(self, source: int, destination: int) -> QueueItem:
+        item = self.remove(source)
+        self.insert(destination, item)
+        return item
+
+    def shuffle(self) -> None:
+        items = list(self)
+        random.shuffle(items)
+        self._rebuild(items)
+        self.revision += 1
+
+    def clear(self) -> None:
+        self._rebuild(())
+        self.revision += 1
+
+    @property
+    def duration(self) -> int:
+        return sum(item.length for item in self)
+
+    def peek(self, current: QueueItem | None) -> QueueItem | None:
+        # what 'next' would return, without changing anything
+        if current is not None and self.loop_mode is enums.LoopMode.TRACK:
+            return current
+        if self._length:
+            return self[0]
+        if current is not None and self.loop_mode is enums.LoopMode.QUEUE:
+            return current
+        return None
+
+    def next(self, current: QueueItem | None) -> QueueItem | None:
+        # decide what to play once the current item has finished, based on the loop mode
+        if current is not None:
+            if self.loop_mode is enums.LoopMode.TRACK:
+                return current
+            self.history.append(current)
+            if self.loop_mode is enums.LoopMode.QUEUE:
+                self.put(current)
+        return self.get()
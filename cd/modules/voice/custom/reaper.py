@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import discord
+
+from cd import utilities, values
+from cd.config import CONFIG
+
+from .player import Player
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["IdleReaper"]
+__log__ = logging.getLogger("cd.modules.voice.custom.reaper")
+
+
+class IdleReaper:
+    """Disconnects players that have been idle for longer than the configured grace period.
+
+    A player is idle when there's nobody but bots in its voice channel, or when nothing is playing and the queue is
+    empty. Players are checked whenever a voice state or track event might have changed that.
+    """
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self._timers: dict[int, asyncio.Task[None]] = {}
+        self._reaped_at: dict[int, float] = {}
+        # stats
+        self.reaped: int = 0
+        self._saved: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"<IdleReaper: pending={len(self._timers)}, reaped={self.reaped}>"
+
+    @property
+    def pending(self) -> int:
+        return len(self._timers)
+
+    @property
+    def saved(self) -> float:
+        # the time that reaped players would have spent sitting idle on a node, up until their guild next needed one
+        now = time.monotonic()
+        return self._saved + sum(now - reaped_at for reaped_at in self._reaped_at.values())
+
+    @staticmethod
+    def is_idle(player: Player) -> bool:
+        if not player.channel:
+            return True
+        if not any(not member.bot for member in player.channel.members):
+            return True
+        return player.current is None and not player.queue
+
+    def check(self, player: Player) -> None:
+        guild_id = player.guild.id
+        if (reaped_at := self._reaped_at.pop(guild_id, None)) is not None:
+            self._saved += time.monotonic() - reaped_at
+        if not self.is_idle(player):
+            if (timer := self._timers.pop(guild_id, None)) is not None:
+                timer.cancel()
+            return
+        if guild_id not in self._timers:
+            self._timers[guild_id] = asyncio.create_task(self._reap_later(guild_id))
+
+    async def _reap_later(self, guild_id: int) -> None:
+        await asyncio.sleep(CONFIG.voice.idle_timeout)
+        del self._timers[guild_id]
+        if (guild := self._bot.get_guild(guild_id)) is None:
+            return
+        # the player might have been replaced or become active without an event saying so
+        if not isinstance(player := guild.voice_client, Player) or not self.is_idle(player):
+            return
+        try:
+            # keyed separately from the leave command, which responds differently
+            await self._bot.player_executor.run(guild_id, lambda: self.reap(player), key="reap")
+        except Exception as error:
+            __log__.error(f"Error while reaping the idle player in guild {guild_id}.", exc_info=error)
+
+    async def reap(self, player: Player) -> None:
+        guild_id = player.guild.id
+        channel = player.channel
+        text_channel = player.now_playing.channel
+        # disconnecting destroys the player on its node and stops its prefetch and now-playing tasks, and its
+        # snapshot is dropped on the next save.
+        self._bot.progress_ticker.unregister(guild_id)
+        player.cancel_ingestions()
+        player.queue.clear()
+        await player.disconnect()
+        self.reaped += 1
+        self._reaped_at[guild_id] = time.monotonic()
+        __log__.info(f"Reaped the idle player in guild {guild_id}.")
+        if text_channel is None or channel is None:
+            return
+        try:
+            await text_channel.send(
+                embed=utilities.embed(
+                    colour=values.THEME_COLOUR,
+                    description=f"I've left {channel.mention} after being idle for "
+                                f"{utilities.format_seconds(CONFIG.voice.idle_timeout)}.",
+                )
+            )
+        except discord.HTTPException:
+            pass
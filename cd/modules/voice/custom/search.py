@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from discord.ext import lava
+
+from cd import utilities
+from cd.config import CONFIG
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["SearchCache"]
+__log__ = logging.getLogger("cd.modules.voice.custom.search")
+
+
+def _normalise(query: str) -> str:
+    query = query.strip()
+    # urls can be case-sensitive, but searches can be folded so that trivially different ones share an entry
+    if query.startswith(("http://", "https://")):
+        return query
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """Caches the tracks returned by lavalink searches, in process and then in redis as encoded track strings."""
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self._cache: utilities.LRUCache[str, list[lava.Track]] = utilities.LRUCache(
+            max_size=CONFIG.caches.search_results.max_size,
+            ttl=CONFIG.caches.search_results.ttl,
+        )
+        # stats
+        self.redis_hits: int = 0
+        self.redis_misses: int = 0
+
+    def __repr__(self) -> str:
+        return f"<SearchCache: cache={self._cache}, redis_hits={self.redis_hits}, redis_misses={self.redis_misses}>"
+
+    @property
+    def cache(self) -> utilities.LRUCache[str, list[lava.Track]]:
+        return self._cache
+
+    async def _get_encoded(self, key: str) -> list[str] | None:
+        try:
+            async with self._bot.redis_breaker:
+                data: str | None = await self._bot.redis.get(key)
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures):
+            return None
+        return data.split("\n") if data else None
+
+    async def _set_encoded(self, key: str, tracks: list[lava.Track]) -> None:
+        try:
+            async with self._bot.redis_breaker:
+                await self._bot.redis.set(
+                    key,
+                    "\n".join(track.encoded for track in tracks),
+                    ex=CONFIG.caches.redis_search_ttl,
+                )
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures) as error:
+            __log__.warning(f"Couldn't store '{key}' in redis: {error}")
+
+    async def _fetch(self, key: str, query: str) -> list[lava.Track]:
+        # decoding tracks that another process or a previous run already found is much cheaper than searching
+        if (encoded := await self._get_encoded(key)) is not None:
+            self.redis_hits += 1
+            return await self._bot.lavalink.decode_tracks(encoded)
+        self.redis_misses += 1
+        tracks = (await self._bot.lavalink.search(query)).tracks
+        # spotify tracks only exist locally until they're resolved, so lavalink wouldn't be able to decode them
+        if tracks and all(track.encoded for track in tracks):
+            await self._set_encoded(key, tracks)
+        return tracks
+
+    async def search(self, query: str, /, *, source: str = "ytsearch") -> list[lava.Track]:
+        query = _normalise(query)
+        if not query.startswith(("http://", "https://")):
+            query = f"{source}:{query}"
+        key = f"cd:searches:{query}"
+        if (tracks := self._cache.get(key)) is not None:
+            return tracks
+        tracks = await self._cache.load(key, lambda: self._fetch(key, query))
+        # don't keep empty results around, the next search might find something
+        if not tracks:
+            self._cache.remove(key)
+        return tracks
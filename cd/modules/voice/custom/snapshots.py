@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+import discord
+import orjson
+from discord.ext import tasks
+
+from cd import enums, utilities
+from cd.config import CONFIG
+
+from .player import Player, PlayerState
+from .queue import Queue, QueueItem
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["PlayerSnapshots"]
+__log__ = logging.getLogger("cd.modules.voice.custom.snapshots")
+
+_INDEX_KEY: str = "cd:players"
+
+
+def _key(guild_id: int) -> str:
+    return f"cd:players:{guild_id}"
+
+
+def _dump_item(item: QueueItem) -> list[Any]:
+    return [base64.b64encode(item.data).decode(), item.length, item.requester_id]
+
+
+def _load_item(data: list[Any]) -> QueueItem:
+    return QueueItem(data=base64.b64decode(data[0]), length=data[1], requester_id=data[2])
+
+
+class PlayerSnapshots:
+    """Periodically saves the state of every player to redis, so that they can be rebuilt after a restart.
+
+    Each guild gets a hash with a small 'state' field, which is rewritten every time, and a 'queue' field, which is
+    only rewritten when the queue has changed since it was last saved.
+    """
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        # the (queue id, revision) that was last saved for each guild
+        self._saved: dict[int, tuple[int, int]] = {}
+        self._loop.change_interval(seconds=CONFIG.voice.snapshot_interval)
+
+    def __repr__(self) -> str:
+        return f"<PlayerSnapshots: saved={len(self._saved)}>"
+
+    @tasks.loop()
+    async def _loop(self) -> None:
+        await self.save()
+
+    @_loop.before_loop
+    async def _before_loop(self) -> None:
+        # players can only be rebuilt once the guilds and channels they were in are cached
+        await self.restore()
+
+    def _dump_state(self, player: Player) -> bytes:
+        node = self._bot.lavalink.get_node(player)
+        # a positional array rather than an object, which keeps snapshots for busy bots small
+        return orjson.dumps([
+            player.channel.id,  # pyright: ignore
+            node.identifier if node is not None else None,
+            _dump_item(player.current) if player.current is not None else None,
+            int(player.position) if player.current is not None else 0,
+            player.is_paused(),
+            player.volume,
+            [sorted(player.effects.presets), player.effects.bands],
+            player.queue.loop_mode.value,
+            time.time(),
+        ])
+
+    async def save(self) -> None:
+        players = {
+            player.guild.id: player for player in self._bot.voice_clients
+            if isinstance(player, Player) and player.channel
+        }
+        try:
+            async with self._bot.redis_breaker, self._bot.redis.pipeline(transaction=False) as pipeline:
+                for guild_id, player in players.items():
+                    key = _key(guild_id)
+                    pipeline.hset(key, "state", self._dump_state(player))
+                    if self._saved.get(guild_id) != (revision := (id(player.queue), player.queue.revision)):
+                        pipeline.hset(key, "queue", orjson.dumps([_dump_item(item) for item in player.queue]))
+                    pipeline.expire(key, CONFIG.voice.snapshot_ttl)
+                    self._saved[guild_id] = revision
+                # forget about players that have been disconnected since the last save
+                if removed := [guild_id for guild_id in self._saved if guild_id not in players]:
+                    pipeline.delete(*map(_key, removed))
+                    pipeline.srem(_INDEX_KEY, *removed)
+                    for guild_id in removed:
+                        del self._saved[guild_id]
+                if players:
+                    pipeline.sadd(_INDEX_KEY, *players)
+                await pipeline.execute()
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures) as error:
+            # save everything again next time, since there's no way to know what made it into redis
+            self._saved.clear()
+            __log__.warning(f"Couldn't save player snapshots: {error}")
+
+    async def _restore(self, guild_id: int, data: dict[str, str]) -> None:
+        channel_id, node_id, current, position, paused, volume, (presets, bands), loop_mode, saved_at = \
+            orjson.loads(data["state"])
+        if not isinstance(channel := self._bot.get_channel(channel_id), discord.VoiceChannel | discord.StageChannel):
+            return
+        node = self._bot.lavalink.nodes.get(node_id)
+        if node is None or not node.available or node.draining:
+            node = self._bot.lavalink.select(region=channel.rtc_region)
+        if node is None:
+            raise RuntimeError("No lavalink nodes are available.")
+        queue = Queue(map(_load_item, orjson.loads(data.get("queue", "[]"))))
+        queue.loop_mode = enums.LoopMode(loop_mode)
+        current = _load_item(current) if current is not None else None
+        track = await node.link.decode_track(current.encoded) if current is not None else None
+        # carry on from where playback would have got to if the bot hadn't restarted
+        if current is not None and not paused:
+            position = min(position + int((time.time() - saved_at) * 1000), current.length)
+        player: Player = await channel.connect(cls=Player(link=node.link))  # pyright: ignore
+        await player.restore(
+            PlayerState(
+                channel_id=channel_id,
+                track=track,
+                position=position,
+                paused=paused,
+                volume=volume,
+                presets=frozenset(presets),
+                bands=tuple(bands),
+                queue=queue,
+                current=current,
+            )
+        )
+
+    async def restore(self) -> None:
+        await self._bot.wait_until_ready()
+        try:
+            async with self._bot.redis_breaker:
+                guild_ids = [int(guild_id) for guild_id in await self._bot.redis.smembers(_INDEX_KEY)]
+                # other processes save snapshots for their own guilds, so only restore the ones this one can see
+                guild_ids = [guild_id for guild_id in guild_ids if self._bot.get_guild(guild_id) is not None]
+                async with self._bot.redis.pipeline(transaction=False) as pipeline:
+                    for guild_id in guild_ids:
+                        pipeline.hgetall(_key(guild_id))
+                    snapshots: list[dict[str, str]] = await pipeline.execute()
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures) as error:
+            __log__.error(f"Couldn't load player snapshots: {error}")
+            return
+        # each player waits for a full voice handshake, so rebuild several at once rather than one after another
+        semaphore = asyncio.Semaphore(CONFIG.voice.snapshot_restore_concurrency)
+
+        async def restore(guild_id: int, data: dict[str, str]) -> bool:
+            async with semaphore:
+                try:
+                    await self._restore(guild_id, data)
+                except Exception as error:
+                    __log__.error(f"Error while restoring the player in guild {guild_id}.", exc_info=error)
+                    return False
+                return True
+
+        # snapshots expire, so a guild might still be in the index without one
+        results = await asyncio.gather(
+            *(restore(guild_id, data) for guild_id, data in zip(guild_ids, snapshots) if data)
+        )
+        __log__.info(f"Restored {sum(results)} players from snapshots.")
+
+    def start(self) -> None:
+        self._loop.start()
+
+    async def close(self) -> None:
+        self._loop.cancel()
+        # a final save means that a graceful restart loses nothing
+        await self.save()
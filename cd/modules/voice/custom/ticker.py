@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import discord
+from discord.ext import tasks
+
+from cd import utilities
+from cd.config import CONFIG
+
+from .player import Player
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["ProgressTicker"]
+__log__ = logging.getLogger("cd.modules.voice.custom.ticker")
+
+
+class ProgressTicker:
+    """Refreshes the progress bars of every now-playing message from a single loop.
+
+    Guilds are spread across the slots of a timer wheel, and each tick only visits one slot, so every message is
+    refreshed once per turn of the wheel. Edits are limited to a global budget per tick, with anything over it
+    carried over to the next tick, and the tick interval backs off while the event loop is lagging.
+    """
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self._wheel: list[set[int]] = [set() for _ in range(CONFIG.voice.progress_wheel_size)]
+        self._slot: int = 0
+        # used as an ordered set, so that checking whether a guild is already carried over doesn't scan it
+        self._overflow: dict[int, None] = {}
+        self._expected_at: float | None = None
+        self.interval: float = CONFIG.voice.progress_interval
+        # stats
+        self.lag_stats: utilities.Histogram = utilities.Histogram()
+        self.edits: int = 0
+        self.skipped: int = 0
+        self.deferred: int = 0
+
+    def __repr__(self) -> str:
+        return f"<ProgressTicker: guilds={sum(map(len, self._wheel))}, interval={self.interval}>"
+
+    def register(self, guild_id: int) -> None:
+        self._wheel[guild_id % len(self._wheel)].add(guild_id)
+
+    def unregister(self, guild_id: int) -> None:
+        self._wheel[guild_id % len(self._wheel)].discard(guild_id)
+
+    def _get_player(self, guild_id: int) -> Player | None:
+        if (guild := self._bot.get_guild(guild_id)) is None:
+            return None
+        player = guild.voice_client
+        return player if isinstance(player, Player) and player.now_playing.message is not None else None
+
+    def _adjust_interval(self, lag: float) -> None:
+        # back off quickly while the loop is struggling, and recover slowly once it isn't
+        if lag > self.interval / 4:
+            interval = min(self.interval * 2, CONFIG.voice.progress_max_interval)
+        else:
+            interval = max(self.interval * 0.9, CONFIG.voice.progress_interval)
+        if interval != self.interval:
+            self.interval = interval
+            self._loop.change_interval(seconds=interval)
+
+    @tasks.loop()
+    async def _loop(self) -> None:
+        now = time.perf_counter()
+        if self._expected_at is not None:
+            lag = max(now - self._expected_at, 0.0)
+            self.lag_stats.record(lag * 1000)
+            self._adjust_interval(lag)
+        self._expected_at = now + self.interval
+        await self._tick()
+
+    async def _tick(self) -> None:
+        slot = self._wheel[self._slot]
+        self._slot = (self._slot + 1) % len(self._wheel)
+        # guilds that didn't fit into the last tick's budget go first
+        guild_ids = [*self._overflow, *(guild_id for guild_id in slot if guild_id not in self._overflow)]
+        self._overflow.clear()
+        players: list[Player] = []
+        for guild_id in guild_ids:
+            if (player := self._get_player(guild_id)) is None:
+                slot.discard(guild_id)
+                continue
+            # paused or idle players have nothing new to show
+            if player.current is None or player.is_paused():
+                self.skipped += 1
+                continue
+            if len(players) >= CONFIG.voice.progress_edit_budget:
+                self._overflow[guild_id] = None
+                self.deferred += 1
+                continue
+            players.append(player)
+        results = await asyncio.gather(*(player.now_playing.flush() for player in players), return_exceptions=True)
+        for player, result in zip(players, results):
+            if isinstance(result, discord.HTTPException):
+                __log__.warning(f"Couldn't refresh the now-playing message in guild {player.guild.id}: {result}")
+            elif isinstance(result, BaseException):
+                __log__.error(f"Error while refreshing the now-playing message in guild {player.guild.id}.",
+                              exc_info=result)
+            elif result:
+                self.edits += 1
+            else:
+                self.skipped += 1
+
+    def start(self) -> None:
+        self._loop.change_interval(seconds=self.interval)
+        self._loop.start()
+
+    def stop(self) -> None:
+        self._loop.stop()
@@ -1,3 +1,5 @@
 from .guild import *
 from .member import *
+from .shared import *
 from .user import *
+from .writer import *
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 import asyncpg
-import dacite
 
 from cd import utilities
 
@@ -16,23 +15,81 @@ if TYPE_CHECKING:
 __all__ = ["GuildData"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class GuildData:
     id: int
     prefix: str | None
 
+    _UPSERT_QUERY: ClassVar[str] = \
+        "INSERT INTO guilds (id, prefix) VALUES ($1, $2) ON CONFLICT (id) DO UPDATE SET prefix = EXCLUDED.prefix"
+    _REDIS_NAMESPACE: ClassVar[str] = "guilds"
+
+    @property
+    def _key(self) -> int:
+        return self.id
+
+    def _upsert_arguments(self) -> tuple[int, str | None]:
+        return self.id, self.prefix
+
+    def _to_redis(self) -> dict[str, str | int]:
+        return {"id": self.id} | ({"prefix": self.prefix} if self.prefix is not None else {})
+
     @classmethod
-    async def get(cls, bot: CD, _id: int) -> GuildData:
-        # return guild data from the cache if possible
-        if _id in bot.guild_data_cache:
-            return bot.guild_data_cache[_id]
-        # otherwise, fetch it from the database, creating a new entry if necessary
-        data: asyncpg.Record = await bot.database.fetchrow(  # pyright: ignore - data is always a record
-            "INSERT INTO guilds (id) VALUES ($1) ON CONFLICT (id) DO UPDATE set id = $1 RETURNING *",
-            _id
+    def _from_redis(cls, data: dict[str, str]) -> GuildData:
+        return cls(id=int(data["id"]), prefix=data.get("prefix"))
+
+    @classmethod
+    async def _fetch(cls, bot: CD, _id: int) -> GuildData:
+        # return unsaved guild data if there is any, so that changes aren't lost when it's evicted from the cache
+        if (guild_data := bot.data_writer.get(cls, _id)) is not None:
+            return guild_data
+        # then try the cache shared with other processes
+        if (guild_data := await bot.shared_cache.get(cls, _id)) is not None:
+            return guild_data
+        # otherwise, fetch guild data from the database
+        data: asyncpg.Record | None = await bot.database.fetchrow(
+            "SELECT * FROM guilds WHERE id = $1",
+            _id,
+            name="guilds.select",
         )
-        # convert the data into a guild data object and cache it
-        guild_data = dacite.from_dict(cls, {**data}, config=utilities.DACITE_CONFIG)
-        bot.guild_data_cache[_id] = guild_data
-        # return the guild data
+        # guilds without an entry are using the default settings
+        guild_data = cls(id=_id, prefix=None) if data is None else utilities.from_record(cls, data)
+        await bot.shared_cache.set(guild_data)
         return guild_data
+
+    @classmethod
+    async def preload(cls, bot: CD, ids: list[int]) -> None:
+        # skip guilds that are already cached
+        if not (ids := [_id for _id in ids if _id not in bot.guild_data_cache]):
+            return
+        # fetch the existing entries for all the guilds at once
+        records: list[asyncpg.Record] = await bot.database.fetch(
+            "SELECT * FROM guilds WHERE id = ANY($1::bigint[])",
+            ids,
+            name="guilds.preload",
+        )
+        # convert the data into guild data objects and cache them
+        for record in records:
+            bot.guild_data_cache.set(record["id"], utilities.from_record(cls, record))
+        # guilds without an entry are using the default settings
+        for _id in ids:
+            if _id not in bot.guild_data_cache:
+                bot.guild_data_cache.set(_id, cls(id=_id, prefix=None))
+
+    @classmethod
+    async def get(cls, bot: CD, _id: int) -> GuildData:
+        # return guild data from the cache if possible
+        if (guild_data := bot.guild_data_cache.get(_id)) is not None:
+            return guild_data
+        # otherwise, fetch and cache it, sharing the query with any concurrent lookups for the same guild
+        return await bot.guild_data_cache.load(_id, lambda: cls._fetch(bot, _id))
+
+    async def set_prefix(self, bot: CD, prefix: str | None) -> None:
+        if prefix == self.prefix:
+            return
+        self.prefix = prefix
+        bot.prefix_cache.pop(self.id, None)
+        # entries are only created once a setting changes from its default, the data writer will upsert it
+        bot.data_writer.mark(self)
+        # let other processes know about the change straight away, rather than after the next flush
+        await bot.shared_cache.publish(self)
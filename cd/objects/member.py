@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 import asyncpg
-import dacite
 
 from cd import utilities
 
@@ -16,26 +15,55 @@ if TYPE_CHECKING:
 __all__ = ["MemberData"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class MemberData:
     user_id: int
     guild_id: int
 
+    _UPSERT_QUERY: ClassVar[str] = \
+        "INSERT INTO members (user_id, guild_id) VALUES ($1, $2) ON CONFLICT (user_id, guild_id) DO NOTHING"
+    _REDIS_NAMESPACE: ClassVar[str] = "members"
+
+    @property
+    def _key(self) -> tuple[int, int]:
+        return self.user_id, self.guild_id
+
+    def _upsert_arguments(self) -> tuple[int, int]:
+        return self.user_id, self.guild_id
+
+    def _to_redis(self) -> dict[str, str | int]:
+        return {"user_id": self.user_id, "guild_id": self.guild_id}
+
     @classmethod
-    async def get(cls, bot: CD, user_id: int, guild_id: int) -> MemberData:
-        # return member data from the cache if possible
-        if (user_id, guild_id) in bot.member_data_cache:
-            return bot.member_data_cache[(user_id, guild_id)]
-        # otherwise, fetch it from the database, creating a new entry if necessary
-        data: asyncpg.Record = await bot.database.fetchrow(  # pyright: ignore - data is always a record
-            "INSERT INTO members (user_id, guild_id) VALUES ($1, $2) "
-            "ON CONFLICT (user_id, guild_id)"
-            "DO UPDATE SET user_id = $1, guild_id = $2 "
-            "RETURNING *",
-            user_id, guild_id
+    def _from_redis(cls, data: dict[str, str]) -> MemberData:
+        return cls(user_id=int(data["user_id"]), guild_id=int(data["guild_id"]))
+
+    @classmethod
+    async def _fetch(cls, bot: CD, user_id: int, guild_id: int) -> MemberData:
+        # return unsaved member data if there is any, so that changes aren't lost when it's evicted from the cache
+        if (member_data := bot.data_writer.get(cls, (user_id, guild_id))) is not None:
+            return member_data
+        # then try the cache shared with other processes
+        if (member_data := await bot.shared_cache.get(cls, (user_id, guild_id))) is not None:
+            return member_data
+        # otherwise, fetch member data from the database
+        data: asyncpg.Record | None = await bot.database.fetchrow(
+            "SELECT * FROM members WHERE user_id = $1 AND guild_id = $2",
+            user_id, guild_id,
+            name="members.select",
         )
-        # convert the data into a member data object and cache it
-        member_data = dacite.from_dict(cls, {**data}, config=utilities.DACITE_CONFIG)
-        bot.member_data_cache[(user_id, guild_id)] = member_data
-        # return the member data
+        # members without an entry are using the default settings
+        if data is None:
+            member_data = cls(user_id=user_id, guild_id=guild_id)
+        else:
+            member_data = utilities.from_record(cls, data)
+        await bot.shared_cache.set(member_data)
         return member_data
+
+    @classmethod
+    async def get(cls, bot: CD, user_id: int, guild_id: int) -> MemberData:
+        # return member data from the cache if possible
+        if (member_data := bot.member_data_cache.get((user_id, guild_id))) is not None:
+            return member_data
+        # otherwise, fetch and cache it, sharing the query with any concurrent lookups for the same member
+        return await bot.member_data_cache.load((user_id, guild_id), lambda: cls._fetch(bot, user_id, guild_id))
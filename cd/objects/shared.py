@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, ClassVar, Protocol, Self
+
+from cd import utilities
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["SharedCache"]
+__log__ = logging.getLogger("cd.objects.shared")
+
+_CHANNEL: str = "cd:invalidations"
+
+
+class Shareable(Protocol):
+    _REDIS_NAMESPACE: ClassVar[str]
+
+    @property
+    def _key(self) -> Hashable: ...
+
+    def _to_redis(self) -> dict[str, str | int]: ...
+
+    @classmethod
+    def _from_redis(cls, data: dict[str, str]) -> Self: ...
+
+
+def _format_key(namespace: str, key: Hashable) -> str:
+    return f"{namespace}:{":".join(map(str, key)) if isinstance(key, tuple) else key}"
+
+
+class SharedCache:
+    """A redis-backed cache of data objects shared between processes, with pub/sub invalidation of local copies."""
+
+    def __init__(self, bot: CD, /, *, ttl: int | None) -> None:
+        self._bot: CD = bot
+        # passed in rather than read from the config, so that data objects can be imported without one
+        self._ttl: int | None = ttl
+        self._id: str = uuid.uuid4().hex
+        self._pubsub = bot.redis.pubsub()
+        self._task: asyncio.Task[None] | None = None
+
+    def __repr__(self) -> str:
+        return f"<SharedCache: id={self._id}>"
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                # listen() reads with the client's socket timeout, so it would fail whenever the channel is idle for
+                # that long, whereas reading with an explicit timeout just returns nothing
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=10.0)
+                if message is None or message["type"] != "message":
+                    continue
+                sender, namespace, *key = message["data"].split(":")
+                if sender != self._id:
+                    self._evict(namespace, [int(part) for part in key])
+            except Exception as error:
+                __log__.error("Error while listening for invalidations, retrying in 5 seconds.", exc_info=error)
+                await asyncio.sleep(5)
+
+    def _evict(self, namespace: str, key: list[int]) -> None:
+        if namespace == "guilds":
+            self._bot.prefix_cache.pop(key[0], None)
+            self._bot.guild_data_cache.remove(key[0])
+        elif namespace == "users":
+            self._bot.user_data_cache.remove(key[0])
+        elif namespace == "members":
+            self._bot.member_data_cache.remove((key[0], key[1]))
+
+    async def start(self) -> None:
+        await self._pubsub.subscribe(_CHANNEL)
+        self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        await self._pubsub.aclose()
+
+    async def get[T: Shareable](self, _type: type[T], key: Hashable) -> T | None:
+        # redis is only a cache, so treat it as empty while it's unavailable
+        try:
+            async with self._bot.redis_breaker:
+                data = await self._bot.redis.hgetall(f"cd:{_format_key(_type._REDIS_NAMESPACE, key)}")
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures):
+            return None
+        return _type._from_redis(data) if data else None
+
+    async def set(self, obj: Shareable) -> None:
+        name = f"cd:{_format_key(obj._REDIS_NAMESPACE, obj._key)}"
+        try:
+            async with self._bot.redis_breaker, self._bot.redis.pipeline() as pipeline:
+                pipeline.delete(name)
+                pipeline.hset(name, mapping=obj._to_redis())
+                if self._ttl is not None:
+                    pipeline.expire(name, self._ttl)
+                await pipeline.execute()
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures) as error:
+            __log__.warning(f"Couldn't store '{name}' in redis: {error}")
+
+    async def publish(self, obj: Shareable) -> None:
+        # store the new data before announcing it, so other processes never re-read the old data from redis
+        await self.set(obj)
+        try:
+            async with self._bot.redis_breaker:
+                await self._bot.redis.publish(
+                    _CHANNEL,
+                    f"{self._id}:{_format_key(obj._REDIS_NAMESPACE, obj._key)}"
+                )
+        except (utilities.CircuitOpen, *self._bot.redis_breaker.failures) as error:
+            __log__.warning(f"Couldn't publish an invalidation for '{obj._REDIS_NAMESPACE}': {error}")
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 import asyncpg
-import dacite
 
 from cd import utilities
 
@@ -16,22 +15,51 @@ if TYPE_CHECKING:
 __all__ = ["UserData"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class UserData:
     id: int
 
+    _UPSERT_QUERY: ClassVar[str] = \
+        "INSERT INTO users (id) VALUES ($1) ON CONFLICT (id) DO NOTHING"
+    _REDIS_NAMESPACE: ClassVar[str] = "users"
+
+    @property
+    def _key(self) -> int:
+        return self.id
+
+    def _upsert_arguments(self) -> tuple[int]:
+        return (self.id,)
+
+    def _to_redis(self) -> dict[str, str | int]:
+        return {"id": self.id}
+
     @classmethod
-    async def get(cls, bot: CD, _id: int) -> UserData:
-        # return user data from the cache if possible
-        if _id in bot.user_data_cache:
-            return bot.user_data_cache[_id]
-        # otherwise, fetch it from the database, creating a new entry if necessary
-        data: asyncpg.Record = await bot.database.fetchrow(  # pyright: ignore - data is always a record
-            "INSERT INTO users (id) VALUES ($1) ON CONFLICT (id) DO UPDATE set id = $1 RETURNING *",
-            _id
+    def _from_redis(cls, data: dict[str, str]) -> UserData:
+        return cls(id=int(data["id"]))
+
+    @classmethod
+    async def _fetch(cls, bot: CD, _id: int) -> UserData:
+        # return unsaved user data if there is any, so that changes aren't lost when it's evicted from the cache
+        if (user_data := bot.data_writer.get(cls, _id)) is not None:
+            return user_data
+        # then try the cache shared with other processes
+        if (user_data := await bot.shared_cache.get(cls, _id)) is not None:
+            return user_data
+        # otherwise, fetch user data from the database
+        data: asyncpg.Record | None = await bot.database.fetchrow(
+            "SELECT * FROM users WHERE id = $1",
+            _id,
+            name="users.select",
         )
-        # convert the data into a user data object and cache it
-        user_data = dacite.from_dict(cls, {**data}, config=utilities.DACITE_CONFIG)
-        bot.user_data_cache[_id] = user_data
-        # return the user data
+        # users without an entry are using the default settings
+        user_data = cls(id=_id) if data is None else utilities.from_record(cls, data)
+        await bot.shared_cache.set(user_data)
         return user_data
+
+    @classmethod
+    async def get(cls, bot: CD, _id: int) -> UserData:
+        # return user data from the cache if possible
+        if (user_data := bot.user_data_cache.get(_id)) is not None:
+            return user_data
+        # otherwise, fetch and cache it, sharing the query with any concurrent lookups for the same user
+        return await bot.user_data_cache.load(_id, lambda: cls._fetch(bot, _id))
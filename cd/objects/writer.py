@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Any, ClassVar, Protocol
+
+from discord.ext import tasks
+
+from cd import utilities
+
+
+if TYPE_CHECKING:
+    from cd.bot import CD
+
+
+__all__ = ["DataWriter"]
+__log__ = logging.getLogger("cd.objects.writer")
+
+
+class Writable(Protocol):
+    _UPSERT_QUERY: ClassVar[str]
+
+    @property
+    def _key(self) -> Hashable: ...
+
+    def _upsert_arguments(self) -> tuple[Any, ...]: ...
+
+
+class DataWriter:
+
+    def __init__(self, bot: CD) -> None:
+        self._bot: CD = bot
+        self._dirty: collections.defaultdict[type[Writable], dict[Hashable, Writable]] = \
+            collections.defaultdict(dict)
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._loop.start()
+
+    def __repr__(self) -> str:
+        return f"<DataWriter: dirty={sum(map(len, self._dirty.values()))}>"
+
+    @tasks.loop(seconds=5.0)
+    async def _loop(self) -> None:
+        try:
+            await self.flush()
+        except Exception as error:
+            __log__.error("Error while flushing data objects.", exc_info=error)
+
+    def get[T: Writable](self, _type: type[T], key: Hashable) -> T | None:
+        return self._dirty[_type].get(key)  # pyright: ignore
+
+    def mark(self, obj: Writable) -> None:
+        self._dirty[type(obj)][obj._key] = obj
+
+    async def flush(self) -> None:
+        async with self._lock:
+            for _type, dirty in list(self._dirty.items()):
+                if not dirty:
+                    continue
+                # take the current batch so that objects marked during the write are kept for the next flush
+                batch = list(dirty.values())
+                dirty.clear()
+                try:
+                    await self._bot.database.executemany(
+                        _type._UPSERT_QUERY,
+                        [obj._upsert_arguments() for obj in batch],
+                        name=f"{_type.__name__}.upsert",
+                    )
+                except Exception:
+                    # put the batch back, without overwriting anything that was marked again in the meantime
+                    for obj in batch:
+                        dirty.setdefault(obj._key, obj)
+                    raise
+                __log__.debug(f"Flushed {len(batch)} {_type.__name__} {utilities.plural('object', len(batch))}.")
+
+    async def close(self) -> None:
+        self._loop.stop()
+        # shutting down has to carry on even if the database is unavailable
+        try:
+            await self.flush()
+        except Exception as error:
+            __log__.error(
+                f"Error while flushing data objects on close, "
+                f"{sum(map(len, self._dirty.values()))} unsaved changes were lost.",
+                exc_info=error,
+            )
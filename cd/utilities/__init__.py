@@ -1,4 +1,8 @@
+from .breakers import *
+from .caches import *
 from .datetimes import *
 from .helpers import *
+from .histograms import *
 from .parsers import *
+from .records import *
 from .strings import *
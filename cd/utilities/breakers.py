@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Awaitable, Callable
+from types import TracebackType
+
+from cd import enums
+
+
+__all__ = [
+    "CircuitOpen",
+    "CircuitBreaker",
+]
+
+
+class CircuitOpen(Exception):
+
+    def __init__(self, breaker: CircuitBreaker) -> None:
+        self.breaker: CircuitBreaker = breaker
+        super().__init__(f"The '{breaker.name}' circuit breaker is open.")
+
+
+type StateChangeCallback = Callable[[CircuitBreaker, enums.CircuitBreakerState], Awaitable[None]]
+
+
+class CircuitBreaker:
+    """Stops calls to a backend after repeated failures, letting a single trial call through every 'reset_after'
+    seconds until one succeeds."""
+
+    def __init__(
+        self,
+        name: str,
+        /, *,
+        failures: tuple[type[BaseException], ...],
+        threshold: int = 5,
+        reset_after: int = 30,
+        on_state_change: StateChangeCallback | None = None,
+    ) -> None:
+        self.name: str = name
+        self.failures: tuple[type[BaseException], ...] = failures
+        self.threshold: int = threshold
+        self.reset_after: int = reset_after
+        self._on_state_change: StateChangeCallback | None = on_state_change
+        self.state: enums.CircuitBreakerState = enums.CircuitBreakerState.CLOSED
+        self._consecutive_failures: int = 0
+        self._opened_at: float = 0.0
+        self._trial: bool = False
+
+    def __repr__(self) -> str:
+        return f"<CircuitBreaker: name='{self.name}', state={self.state.name}>"
+
+    @property
+    def is_open(self) -> bool:
+        return self.state is enums.CircuitBreakerState.OPEN \
+            and time.monotonic() - self._opened_at < self.reset_after
+
+    async def _set_state(self, state: enums.CircuitBreakerState) -> None:
+        if state is self.state:
+            return
+        self.state = state
+        if self._on_state_change is not None:
+            await self._on_state_change(self, state)
+
+    async def __aenter__(self) -> None:
+        if self.state is enums.CircuitBreakerState.OPEN:
+            if self.is_open:
+                raise CircuitOpen(self)
+            await self._set_state(enums.CircuitBreakerState.HALF_OPEN)
+        if self.state is enums.CircuitBreakerState.HALF_OPEN:
+            # only let one call through to test whether the backend has recovered
+            if self._trial:
+                raise CircuitOpen(self)
+            self._trial = True
+
+    async def __aexit__(
+        self,
+        exception_type: type[BaseException] | None,
+        exception: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exception is not None and isinstance(exception, self.failures):
+            self._consecutive_failures += 1
+            self._trial = False
+            if self.state is enums.CircuitBreakerState.HALF_OPEN or self._consecutive_failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                await self._set_state(enums.CircuitBreakerState.OPEN)
+        # any other exception still means the backend responded
+        elif exception is None or isinstance(exception, Exception):
+            self._consecutive_failures = 0
+            self._trial = False
+            await self._set_state(enums.CircuitBreakerState.CLOSED)
+        # the call was cancelled, so it doesn't say anything about the backend
+        else:
+            self._trial = False
@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import time
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+
+
+__all__ = [
+    "LRUCache",
+]
+
+
+class LRUCache[K: Hashable, V]:
+    """A least-recently-used cache whose entries expire after not being accessed for 'ttl' seconds."""
+
+    def __init__(self, *, max_size: int | None = None, ttl: int | None = None) -> None:
+        self.max_size: int | None = max_size
+        self.ttl: int | None = ttl
+        self._entries: collections.OrderedDict[K, tuple[V, float]] = collections.OrderedDict()
+        self._loading: dict[K, asyncio.Task[V]] = {}
+        # stats
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.coalesced: int = 0
+
+    def __repr__(self) -> str:
+        return f"<LRUCache: size={len(self)}, max_size={self.max_size}, ttl={self.ttl}, " \
+               f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}, coalesced={self.coalesced}>"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _expires_at(self) -> float:
+        return (time.monotonic() + self.ttl) if self.ttl is not None else 0.0
+
+    def _purge(self) -> None:
+        # remove expired entries from the front of the cache
+        if self.ttl is not None:
+            now = time.monotonic()
+            while self._entries:
+                key, (_, expires_at) = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                del self._entries[key]
+                self.evictions += 1
+        # remove the least recently used entries if the cache is too big
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: K) -> V | None:
+        if (entry := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if self.ttl is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries[key] = (value, self._expires_at())
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._entries[key] = (value, self._expires_at())
+        self._entries.move_to_end(key)
+        self._purge()
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            del self._loading[key]
+
+    async def load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        """Loads and caches the value for a key, sharing a single call to 'loader' between concurrent callers."""
+        if (task := self._loading.get(key)) is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._loading[key] = task
+        else:
+            self.coalesced += 1
+        # shield the shared task so that one caller being cancelled doesn't cancel it for everyone else
+        return await asyncio.shield(task)
+
+    def remove(self, key: K) -> V | None:
+        if (entry := self._entries.pop(key, None)) is None:
+            return None
+        self.evictions += 1
+        return entry[0]
+
+    def remove_where(self, predicate: Callable[[K], bool]) -> int:
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        self.evictions += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
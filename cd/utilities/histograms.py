@@ -0,0 +1,63 @@
+import bisect
+import math
+
+
+__all__ = [
+    "Histogram",
+]
+
+_DEFAULT_BOUNDS: tuple[float, ...] = (
+    0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0, math.inf,
+)
+
+
+class Histogram:
+    """A fixed-bucket histogram of durations in milliseconds, used to estimate percentiles in constant memory."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[float, ...] = _DEFAULT_BOUNDS) -> None:
+        self.bounds: tuple[float, ...] = bounds
+        self.counts: list[int] = [0] * len(bounds)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Histogram: count={self.count}, p50={self.p50:.2f}, p95={self.p95:.2f}, p99={self.p99:.2f}>"
+
+    def record(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = percentile / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                # interpolate within the bucket, using the largest recorded value as the top of the last one
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * ((rank - cumulative) / count)
+            cumulative += count
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
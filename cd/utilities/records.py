@@ -0,0 +1,32 @@
+import dataclasses
+from collections.abc import Callable, Mapping
+from typing import Any
+
+
+__all__ = [
+    "build_record_converter",
+    "from_record",
+]
+
+type Record = Mapping[str, Any]
+
+_CONVERTERS: dict[type[Any], Callable[[Record], Any]] = {}
+
+
+def build_record_converter[T](cls: type[T]) -> Callable[[Record], T]:
+    """Builds a function that creates an instance of a dataclass from a record with a column for each field."""
+    fields = [field.name for field in dataclasses.fields(cls) if field.init]  # pyright: ignore
+    namespace: dict[str, Any] = {"cls": cls}
+    exec(
+        f"def convert(record):\n"
+        f"    return cls({", ".join(f"record[{name!r}]" for name in fields)})",
+        namespace
+    )
+    return namespace["convert"]
+
+
+def from_record[T](cls: type[T], record: Record) -> T:
+    """Creates an instance of a dataclass from a record, building and caching a converter for it if necessary."""
+    if (converter := _CONVERTERS.get(cls)) is None:
+        converter = _CONVERTERS[cls] = build_record_converter(cls)
+    return converter(record)
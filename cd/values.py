@@ -2,7 +2,7 @@ import discord
 
 
 __all__ = [
-    "INTENTS",
+    "INTENT_PROFILES",
     "ALLOWED_MENTIONS",
     "STATUS",
     "ACTIVITY",
@@ -18,7 +18,17 @@ __all__ = [
     "PAGINATOR_LAST_BUTTON_EMOJI",
 ]
 
-INTENTS: discord.Intents = discord.Intents().all()
+INTENT_PROFILES: dict[str, discord.Intents] = {
+    # enough for prefix commands and voice, members are only cached while they're in a voice channel
+    "minimal-music": discord.Intents(
+        guilds=True,
+        voice_states=True,
+        guild_messages=True,
+        dm_messages=True,
+        message_content=True,
+    ),
+    "full":          discord.Intents.all(),
+}
 ALLOWED_MENTIONS: discord.AllowedMentions = discord.AllowedMentions(
     everyone=False,
     users=True,
@@ -0,0 +1,356 @@
+"""A fake lavalink v4 node for testing player migration end to end without any audio sources.
+
+It implements the websocket and the parts of the REST api that cd-bot uses, returns generated tracks for every
+search, and simulates playback by sending player updates and track start/end events. A node can be made to fail,
+and recover, at any point with the '/fake/fail' and '/fake/recover' endpoints, or after a fixed number of seconds
+with '--fail-after'.
+
+Run from the repository root with 'python -m scripts.fake_lavalink --port 2333', once per fake node.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import struct
+import time
+import uuid
+from typing import Any
+
+import orjson
+from aiohttp import web
+
+
+_argument_parser = argparse.ArgumentParser(
+    prog="fake_lavalink.py",
+    description="A fake lavalink v4 node for testing cd-bot offline",
+)
+_argument_parser.add_argument("--host", default="127.0.0.1")
+_argument_parser.add_argument("--port", type=int, default=2333)
+_argument_parser.add_argument("--password", default="youshallnotpass")
+_argument_parser.add_argument("--fail-after", type=float, default=None, metavar="<seconds>")
+
+
+def _now() -> int:
+    return int(time.time() * 1000)
+
+
+def _build_track(query: str, index: int) -> dict[str, Any]:
+    identifier = hashlib.sha1(f"{query}:{index}".encode()).hexdigest()[:11]
+    info = {
+        "identifier": identifier,
+        "isSeekable": True,
+        "author":     "Fake Lavalink",
+        "length":     180_000,
+        "isStream":   False,
+        "position":   0,
+        "title":      f"{query} ({index + 1})",
+        "uri":        f"https://example.com/{identifier}",
+        "artworkUrl": None,
+        "isrc":       None,
+        "sourceName": "http",
+    }
+    return {"encoded": _encode(info), "info": info, "pluginInfo": {}, "userData": {}}
+
+
+def _write_utf(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def _read_utf(data: bytes, offset: int) -> tuple[str, int]:
+    length, = struct.unpack_from("!H", data, offset)
+    return data[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+
+
+def _encode(info: dict[str, Any]) -> str:
+    # the same (version 3) layout that lavaplayer uses, so that cd-bot can read track info out of encoded tracks
+    body = bytes([3]) \
+        + _write_utf(info["title"]) \
+        + _write_utf(info["author"]) \
+        + struct.pack("!q", info["length"]) \
+        + _write_utf(info["identifier"]) \
+        + struct.pack("!?", info["isStream"]) \
+        + struct.pack("!?", True) + _write_utf(info["uri"]) \
+        + struct.pack("!?", False) \
+        + struct.pack("!?", False) \
+        + _write_utf(info["sourceName"]) \
+        + struct.pack("!q", info["position"])
+    return base64.b64encode(struct.pack("!I", len(body) | 1 << 30) + body).decode()
+
+
+def _decode(encoded: str) -> dict[str, Any]:
+    data = base64.b64decode(encoded)
+    title, offset = _read_utf(data, 5)
+    author, offset = _read_utf(data, offset)
+    length, = struct.unpack_from("!q", data, offset)
+    identifier, offset = _read_utf(data, offset + 8)
+    is_stream, = struct.unpack_from("!?", data, offset)
+    uri, offset = _read_utf(data, offset + 2)
+    source_name, offset = _read_utf(data, offset + 2)
+    info = {
+        "identifier": identifier,
+        "isSeekable": not is_stream,
+        "author":     author,
+        "length":     length,
+        "isStream":   is_stream,
+        "position":   0,
+        "title":      title,
+        "uri":        uri,
+        "artworkUrl": None,
+        "isrc":       None,
+        "sourceName": source_name,
+    }
+    return {"encoded": encoded, "info": info, "pluginInfo": {}, "userData": {}}
+
+
+class FakePlayer:
+
+    def __init__(self, node: FakeNode, guild_id: str) -> None:
+        self.node: FakeNode = node
+        self.guild_id: str = guild_id
+        self.track: dict[str, Any] | None = None
+        self.volume: int = 100
+        self.paused: bool = False
+        self.filters: dict[str, Any] = {}
+        self.voice: dict[str, Any] = {}
+        self._position: int = 0
+        self._updated_at: int = _now()
+        self._end_task: asyncio.Task[None] | None = None
+
+    @property
+    def position(self) -> int:
+        if self.track is None:
+            return 0
+        if self.paused:
+            return self._position
+        return min(self._position + _now() - self._updated_at, self.track["info"]["length"])
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "guildId": self.guild_id,
+            "track":   self.track,
+            "volume":  self.volume,
+            "paused":  self.paused,
+            "state":   {"time": _now(), "position": self.position, "connected": bool(self.voice), "ping": 0},
+            "voice":   self.voice,
+            "filters": self.filters,
+        }
+
+    def _schedule_end(self) -> None:
+        if self._end_task is not None:
+            self._end_task.cancel()
+            self._end_task = None
+        if self.track is None or self.paused:
+            return
+        self._end_task = asyncio.create_task(self._end((self.track["info"]["length"] - self.position) / 1000))
+
+    async def _end(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        track, self.track = self.track, None
+        await self.node.send_event(self.guild_id, "TrackEndEvent", track=track, reason="finished")
+
+    async def update(self, data: dict[str, Any]) -> None:
+        self._position = self.position
+        self._updated_at = _now()
+        if "voice" in data:
+            self.voice = data["voice"]
+        if "volume" in data:
+            self.volume = data["volume"]
+        if "filters" in data:
+            self.filters = data["filters"]
+        if "paused" in data:
+            self.paused = data["paused"]
+        encoded = data.get("encodedTrack", (data.get("track") or {}).get("encoded", ...))
+        if encoded is not ...:
+            previous, self.track = self.track, (_decode(encoded) if encoded else None)
+            self._position = 0
+            if previous is not None:
+                reason = "replaced" if self.track is not None else "stopped"
+                await self.node.send_event(self.guild_id, "TrackEndEvent", track=previous, reason=reason)
+            if self.track is not None:
+                await self.node.send_event(self.guild_id, "TrackStartEvent", track=self.track)
+        if "position" in data:
+            self._position = data["position"]
+        self._schedule_end()
+
+    def destroy(self) -> None:
+        if self._end_task is not None:
+            self._end_task.cancel()
+
+
+class FakeNode:
+
+    def __init__(self, password: str) -> None:
+        self.password: str = password
+        self.failed: bool = False
+        self.session_id: str = uuid.uuid4().hex[:16]
+        self.players: dict[str, FakePlayer] = {}
+        self.websocket: web.WebSocketResponse | None = None
+        self.started_at: int = _now()
+
+    async def send(self, payload: dict[str, Any]) -> None:
+        if self.websocket is not None and not self.websocket.closed:
+            await self.websocket.send_str(orjson.dumps(payload).decode())
+
+    async def send_event(self, guild_id: str, _type: str, **data: Any) -> None:
+        await self.send({"op": "event", "type": _type, "guildId": guild_id, **data})
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "players":        len(self.players),
+            "playingPlayers": sum(1 for player in self.players.values() if player.track and not player.paused),
+            "uptime":         _now() - self.started_at,
+            "memory":         {"free": 0, "used": 0, "allocated": 0, "reservable": 0},
+            "cpu":            {"cores": 1, "systemLoad": 0.0, "lavalinkLoad": 0.0},
+            "frameStats":     None,
+        }
+
+    async def fail(self) -> None:
+        self.failed = True
+        for player in self.players.values():
+            player.destroy()
+        self.players.clear()
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    # middleware
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        if request.path.startswith("/fake/"):
+            return await handler(request)
+        if self.failed:
+            raise web.HTTPServiceUnavailable()
+        if request.headers.get("Authorization") != self.password:
+            raise web.HTTPUnauthorized()
+        return await handler(request)
+
+    # websocket
+
+    async def websocket_handler(self, request: web.Request) -> web.WebSocketResponse:
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self.websocket = websocket
+        self.session_id = uuid.uuid4().hex[:16]
+        await self.send({"op": "ready", "resumed": False, "sessionId": self.session_id})
+        updates = asyncio.create_task(self._send_updates())
+        try:
+            async for _ in websocket:
+                pass
+        finally:
+            updates.cancel()
+        return websocket
+
+    async def _send_updates(self) -> None:
+        while True:
+            await asyncio.sleep(5)
+            await self.send({"op": "stats", **self.stats()})
+            for player in self.players.values():
+                await self.send({"op": "playerUpdate", "guildId": player.guild_id, "state": player.to_json()["state"]})
+
+    # rest
+
+    async def info(self, _: web.Request) -> web.Response:
+        return web.json_response({
+            "version":        {"semver": "4.0.0", "major": 4, "minor": 0, "patch": 0, "preRelease": None},
+            "buildTime":      0,
+            "git":            {"branch": "fake", "commit": "fake", "commitTime": 0},
+            "jvm":            "fake",
+            "lavaplayer":     "fake",
+            "sourceManagers": ["http"],
+            "filters":        ["equalizer", "timescale", "rotation", "volume"],
+            "plugins":        [],
+        })
+
+    async def version(self, _: web.Request) -> web.Response:
+        return web.Response(text="4.0.0")
+
+    async def stats_handler(self, _: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def load_tracks(self, request: web.Request) -> web.Response:
+        identifier = request.query.get("identifier", "")
+        query = identifier.split(":", 1)[-1]
+        if identifier.startswith(("ytsearch:", "ytmsearch:", "scsearch:")):
+            return web.json_response({"loadType": "search", "data": [_build_track(query, i) for i in range(5)]})
+        return web.json_response({
+            "loadType": "playlist",
+            "data":     {
+                "info":       {"name": query, "selectedTrack": -1},
+                "pluginInfo": {},
+                "tracks":     [_build_track(query, i) for i in range(50)],
+            },
+        })
+
+    async def decode_track(self, request: web.Request) -> web.Response:
+        return web.json_response(_decode(request.query["encodedTrack"]))
+
+    async def decode_tracks(self, request: web.Request) -> web.Response:
+        return web.json_response([_decode(encoded) for encoded in await request.json()])
+
+    async def get_players(self, _: web.Request) -> web.Response:
+        return web.json_response([player.to_json() for player in self.players.values()])
+
+    async def get_player(self, request: web.Request) -> web.Response:
+        if (player := self.players.get(request.match_info["guild_id"])) is None:
+            raise web.HTTPNotFound()
+        return web.json_response(player.to_json())
+
+    async def update_player(self, request: web.Request) -> web.Response:
+        guild_id = request.match_info["guild_id"]
+        if (player := self.players.get(guild_id)) is None:
+            player = self.players[guild_id] = FakePlayer(self, guild_id)
+        await player.update(await request.json())
+        return web.json_response(player.to_json())
+
+    async def destroy_player(self, request: web.Request) -> web.Response:
+        if (player := self.players.pop(request.match_info["guild_id"], None)) is not None:
+            player.destroy()
+        return web.Response(status=204)
+
+    async def update_session(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        return web.json_response({"resuming": data.get("resuming", False), "timeout": data.get("timeout", 60)})
+
+    # controls
+
+    async def fail_handler(self, _: web.Request) -> web.Response:
+        await self.fail()
+        return web.Response(text="failed")
+
+    async def recover_handler(self, _: web.Request) -> web.Response:
+        self.failed = False
+        return web.Response(text="recovered")
+
+
+def main() -> None:
+    arguments = _argument_parser.parse_args()
+    node = FakeNode(arguments.password)
+    app = web.Application(middlewares=[node.middleware])
+    app.add_routes([
+        web.get("/v4/websocket", node.websocket_handler),
+        web.get("/v4/info", node.info),
+        web.get("/version", node.version),
+        web.get("/v4/stats", node.stats_handler),
+        web.get("/v4/loadtracks", node.load_tracks),
+        web.get("/v4/decodetrack", node.decode_track),
+        web.post("/v4/decodetracks", node.decode_tracks),
+        web.get("/v4/sessions/{session_id}/players", node.get_players),
+        web.get("/v4/sessions/{session_id}/players/{guild_id}", node.get_player),
+        web.patch("/v4/sessions/{session_id}/players/{guild_id}", node.update_player),
+        web.delete("/v4/sessions/{session_id}/players/{guild_id}", node.destroy_player),
+        web.patch("/v4/sessions/{session_id}", node.update_session),
+        web.post("/fake/fail", node.fail_handler),
+        web.post("/fake/recover", node.recover_handler),
+    ])
+    if arguments.fail_after is not None:
+        async def fail_after(_: web.Application) -> None:
+            asyncio.get_running_loop().call_later(arguments.fail_after, lambda: asyncio.create_task(node.fail()))
+        app.on_startup.append(fail_after)
+    web.run_app(app, host=arguments.host, port=arguments.port)
+
+
+if __name__ == "__main__":
+    main()